@@ -1,4 +1,6 @@
+import asyncio
 import aiohttp
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from tenacity import (
     retry,
@@ -6,8 +8,10 @@ from tenacity import (
     wait_random_exponential,
 )
 
+from . import metrics
 from .blob_client import BlobWriter
-from .utils import get_env, make_key
+from .codec import Codec, decode, encode, get_codec, get_gzip_level
+from .utils import get_env, make_key, positive_int
 from .logging import get_logger
 
 
@@ -17,27 +21,120 @@ logger = get_logger(__name__)
 class ApiClient(BlobWriter):
     """
     API client for sending data to Amberflo's ingestion endpoint.
+
+    Bodies larger than `max_payload_bytes` are split into smaller requests,
+    sent concurrently, at most `max_concurrent_requests` at a time. They are
+    split in a dedicated thread, so as not to compete with LiteLLM for the
+    default executor.
+
+    The HTTP session is created lazily, on the running event loop.
     """
 
     def __init__(
         self,
         api_key=None,
         endpoint="https://ingest.amberflo.io",
+        max_payload_bytes=4 * 1024 * 1024,
+        max_concurrent_requests=4,
+        max_connections=10,
+        keepalive_timeout=30,
+        request_timeout=60,
     ):
         self.endpoint = get_env("AFLO_API_ENDPOINT", default=endpoint)
 
         api_key = get_env("AFLO_API_KEY", default=api_key, required=True)
 
-        headers = {"x-api-key": api_key, "Content-Encoding": "gzip"}
-
-        self.session = aiohttp.ClientSession(headers=headers)
+        self.headers = {"x-api-key": api_key, "Content-Encoding": "gzip"}
+
+        self.max_payload_bytes = int(
+            get_env(
+                "AFLO_API_MAX_PAYLOAD_BYTES", max_payload_bytes, validate=positive_int
+            )
+        )
+        self.max_concurrent_requests = max(
+            1,
+            int(
+                get_env(
+                    "AFLO_API_MAX_CONCURRENT_REQUESTS",
+                    max_concurrent_requests,
+                    validate=positive_int,
+                )
+            ),
+        )
+        self.max_connections = int(
+            get_env("AFLO_API_MAX_CONNECTIONS", max_connections, validate=positive_int)
+        )
+        self.keepalive_timeout = int(
+            get_env(
+                "AFLO_API_KEEPALIVE_TIMEOUT", keepalive_timeout, validate=positive_int
+            )
+        )
+        self.request_timeout = int(
+            get_env("AFLO_API_REQUEST_TIMEOUT", request_timeout, validate=positive_int)
+        )
+
+        self.codec = get_codec()
+        self.gzip_level = get_gzip_level()
+
+        self._session: aiohttp.ClientSession | None = None
+
+        # only starts a thread once a body is split
+        self.executor = ThreadPoolExecutor(1, thread_name_prefix="aflo-api")
 
         logger.debug("Initialized API client: endpoint: %s", self.endpoint)
 
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """
+        Lazy initialization of the HTTP session, as it must be created on the
+        running event loop.
+        """
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                keepalive_timeout=self.keepalive_timeout,
+                use_dns_cache=True,
+                ttl_dns_cache=300,
+            )
+            self._session = aiohttp.ClientSession(
+                headers=self.headers,
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.request_timeout),
+            )
+        return self._session
+
     async def put_object(self, key: str, body: bytes) -> None:
         logger.debug("Attempting write to API: %s", key)
 
-        await self._send_with_retry(key, body)
+        if not self.max_payload_bytes or len(body) <= self.max_payload_bytes:
+            await self._send_with_retry(key, body)
+            return
+
+        # Decompressing and compressing again is CPU bound
+        loop = asyncio.get_running_loop()
+        chunks = await loop.run_in_executor(
+            self.executor,
+            _split_body,
+            body,
+            self.max_payload_bytes,
+            self.codec,
+            self.gzip_level,
+        )
+
+        logger.debug("Splitting write to API in %s requests: %s", len(chunks), key)
+
+        semaphore = asyncio.Semaphore(self.max_concurrent_requests)
+
+        async def send(i, chunk):
+            async with semaphore:
+                await self._send_with_retry(f"{key}#{i}", chunk)
+
+        await asyncio.gather(*(send(i, c) for i, c in enumerate(chunks)))
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
 
     def make_key(self, timestamp: datetime) -> str:
         return make_key(timestamp, None)
@@ -46,6 +143,7 @@ class ApiClient(BlobWriter):
         reraise=True,
         wait=wait_random_exponential(multiplier=2, min=4, max=30),
         stop=stop_after_attempt(5),
+        before_sleep=lambda _: metrics.upload_retries.inc(backend="ApiClient"),
     )
     async def _send_with_retry(self, key, data):
         async with self.session.post(self.endpoint, data=data) as r:
@@ -63,3 +161,39 @@ class ApiClient(BlobWriter):
                     logger.error(error)
                 else:
                     raise RuntimeError(error)
+
+
+def _split_body(
+    body: bytes,
+    max_payload_bytes: int,
+    codec: Codec | None = None,
+    level: int | None = None,
+) -> list[bytes]:
+    """
+    Split a compressed JSON array of events into compressed bodies of at most
+    `max_payload_bytes`, unless a single event is larger than that.
+    """
+    codec = codec or get_codec()
+    level = level or get_gzip_level()
+
+    events = decode(body, codec)
+
+    # assume events compress about the same, and refine below if not
+    parts = -(-len(body) // max_payload_bytes)
+    size = max(1, -(-len(events) // parts))
+
+    chunks = []
+    # in reverse, since parts are popped from the end
+    pending = [events[i : i + size] for i in reversed(range(0, len(events), size))]
+
+    while pending:
+        part = pending.pop()
+        chunk = encode(part, codec, level)
+
+        if len(chunk) > max_payload_bytes and len(part) > 1:
+            middle = len(part) // 2
+            pending += [part[middle:], part[:middle]]
+        else:
+            chunks.append(chunk)
+
+    return chunks
@@ -1,19 +1,46 @@
 from datetime import datetime
 
+import aiohttp
+from azure.core.pipeline.transport import AioHttpTransport
 from azure.storage.blob import ContentSettings
-from azure.storage.blob.aio import BlobServiceClient, ExponentialRetry
+from azure.storage.blob.aio import ContainerClient, ExponentialRetry
 
+from . import metrics
 from .blob_client import BlobWriter
-from .utils import get_env, make_key
+from .utils import get_env, make_key, positive_int
 from .logging import get_logger
 
 
 logger = get_logger(__name__)
 
 
+_content_settings = ContentSettings(
+    content_type="application/json",
+    content_encoding="gzip",
+)
+
+
+class _CountingRetry(ExponentialRetry):
+    """
+    Counts the retries in the metrics.
+    """
+
+    def increment(self, settings, request, response=None, error=None) -> bool:
+        retrying = super().increment(settings, request, response=response, error=error)
+
+        if retrying:
+            metrics.upload_retries.inc(backend="AzureBlobClient")
+
+        return retrying
+
+
 class AzureBlobClient(BlobWriter):
     """
     Wrapper around the Azure Blob Storage client.
+
+    A single container client is created on first use, on the running event
+    loop, and reused for every upload. Its transport has a connection pool of
+    `pool_size` connections, kept alive between uploads.
     """
 
     def __init__(
@@ -23,67 +50,136 @@ class AzureBlobClient(BlobWriter):
         account_key=None,
         container_name=None,
         path=None,
+        pool_size=10,
+        max_single_put_size=None,
+        max_block_size=None,
+        max_concurrency=1,
     ):
         self.container = str(
             get_env("AFLO_CONTAINER_NAME", container_name, required=True)
         )
         self.path = get_env("AFLO_PATH", path)
 
-        # https://learn.microsoft.com/en-us/python/api/azure-storage-blob/azure.storage.blob.aio.exponentialretry
-        retry = ExponentialRetry(initial_backoff=2, increment_base=3, retry_total=3)
+        self.pool_size = int(
+            get_env("AFLO_AZURE_POOL_SIZE", pool_size, validate=positive_int)
+        )
+        self.max_concurrency = max(
+            1,
+            int(
+                get_env(
+                    "AFLO_AZURE_MAX_CONCURRENCY", max_concurrency, validate=positive_int
+                )
+            ),
+        )
 
-        connection_string = get_env(
-            "AZURE_STORAGE_CONNECTION_STRING", connection_string
+        # Leave the SDK defaults unless set
+        self.client_options = {}
+
+        max_single_put_size = get_env(
+            "AFLO_AZURE_MAX_SINGLE_PUT_SIZE", max_single_put_size, validate=positive_int
         )
+        if max_single_put_size:
+            self.client_options["max_single_put_size"] = int(max_single_put_size)
 
-        if connection_string:
-            logger.debug("Initializing Azure Blob service from connection string")
-            self.blob_service = BlobServiceClient.from_connection_string(
-                connection_string, retry_policy=retry
-            )
+        max_block_size = get_env(
+            "AFLO_AZURE_MAX_BLOCK_SIZE", max_block_size, validate=positive_int
+        )
+        if max_block_size:
+            self.client_options["max_block_size"] = int(max_block_size)
 
-        else:
-            logger.debug(
-                "Initializing Azure Blob service from account name and key pair"
-            )
+        self.connection_string = get_env(
+            "AZURE_STORAGE_CONNECTION_STRING", connection_string
+        )
 
+        if not self.connection_string:
             account_name = get_env("AZURE_STORAGE_ACCOUNT_NAME", account_name)
-            account_key = get_env("AZURE_STORAGE_ACCOUNT_KEY", account_key)
+            self.account_key = get_env("AZURE_STORAGE_ACCOUNT_KEY", account_key)
+            self.account_url = f"https://{account_name}.blob.core.windows.net"
 
-            account_url = f"https://{account_name}.blob.core.windows.net"
-
-            self.blob_service = BlobServiceClient(
-                account_url=account_url, credential=account_key, retry_policy=retry
-            )
+        self._container_client: ContainerClient | None = None
+        self._session: aiohttp.ClientSession | None = None
 
         logger.debug(
-            "Initialized Azure Blob client: container: '%s', path: '%s'",
+            "Initialized Azure Blob client: container: '%s', path: '%s', pool_size: %s",
             self.container,
             self.path,
+            self.pool_size,
         )
 
-    async def put_object(self, key: str, body: bytes) -> None:
-        logger.debug(
-            f"Attempting write to Azure Blob container {self.container}: {key}"
+    @property
+    def container_client(self) -> ContainerClient:
+        """
+        Lazy initialization of the container client, as its connection pool
+        must be created on the running event loop.
+        """
+        if self._container_client is None:
+            self._container_client = self._build_container_client()
+        return self._container_client
+
+    def _build_container_client(self) -> ContainerClient:
+        # https://learn.microsoft.com/en-us/python/api/azure-storage-blob/azure.storage.blob.aio.exponentialretry
+        retry = _CountingRetry(initial_backoff=2, increment_base=3, retry_total=3)
+
+        # Same session settings as the SDK's default, plus a sized connection
+        # pool.
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.pool_size),
+            cookie_jar=aiohttp.DummyCookieJar(),
+            auto_decompress=False,
+            trust_env=True,
         )
+        transport = AioHttpTransport(session=self._session, session_owner=False)
+
+        options = {"retry_policy": retry, "transport": transport, **self.client_options}
 
-        blob_client = self.blob_service.get_blob_client(
-            container=self.container, blob=key
+        if self.connection_string:
+            logger.debug("Initializing Azure Blob container from connection string")
+            return ContainerClient.from_connection_string(
+                self.connection_string, self.container, **options
+            )
+
+        logger.debug("Initializing Azure Blob container from account name and key pair")
+        return ContainerClient(
+            self.account_url, self.container, credential=self.account_key, **options
         )
 
-        content_settings = ContentSettings(
-            content_type="application/json",
-            content_encoding="gzip",
+    async def warm_up(self) -> None:
+        """
+        Create the container client and open a connection ahead of the first
+        upload.
+        """
+        try:
+            await self.container_client.get_container_properties()
+            logger.debug("Warmed up Azure Blob container: %s", self.container)
+
+        except Exception as e:
+            # e.g. the credentials only allow writing blobs
+            logger.debug("Failed to warm up Azure Blob container: %s", e)
+
+    async def put_object(self, key: str, body: bytes) -> None:
+        logger.debug(
+            f"Attempting write to Azure Blob container {self.container}: {key}"
         )
 
-        r = await blob_client.upload_blob(
+        r = await self.container_client.upload_blob(
+            key,
             body,
             overwrite=True,
-            content_settings=content_settings,
+            content_settings=_content_settings,
+            max_concurrency=self.max_concurrency,
         )
         logger.debug("r: %s", r)
 
         logger.debug(f"Wrote to Azure Blob container {self.container}: {key}")
 
+    async def close(self) -> None:
+        if self._container_client is not None:
+            await self._container_client.close()
+            self._container_client = None
+
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
     def make_key(self, timestamp: datetime) -> str:
         return make_key(timestamp, self.path)
@@ -1,5 +1,14 @@
+import asyncio
+import threading
+import time
 from datetime import datetime
-from typing import Protocol
+from typing import Callable, Protocol
+
+from .utils import make_key
+from .logging import get_logger
+
+
+logger = get_logger(__name__)
 
 
 class BlobWriter(Protocol):
@@ -12,3 +21,102 @@ class BlobWriter(Protocol):
     async def put_object(self, key: str, body: bytes) -> None: ...
 
     def make_key(self, timestamp: datetime) -> str: ...
+
+    async def warm_up(self) -> None:
+        """
+        Optionally prepare the connection ahead of the first write.
+        """
+
+    async def ready(self) -> bool:
+        """
+        Optionally tell whether blobs can be written at all, e.g. that the
+        client could be built. Until then, events are kept in the buffer.
+        """
+        return True
+
+    async def drain(self, timeout: float | None = None) -> bool:
+        """
+        Optionally wait for the writes that run in the background to
+        complete, on shutdown. Return whether they did within the timeout.
+        """
+        return True
+
+
+class LazyBlobWriter(BlobWriter):
+    """
+    Builds the actual blob writer with `factory` on first use, so that
+    importing and setting up a storage SDK does not slow down the start up.
+
+    It is always built in a thread, off the event loop, usually by the warm
+    up. Keys are made from `path`, like the blob writers do, without it.
+
+    When building fails, e.g. because of a missing setting, it is not ready,
+    and building is only tried again after `retry_interval` seconds.
+    """
+
+    retry_interval = 10
+
+    def __init__(
+        self,
+        name: str,
+        factory: Callable[[], BlobWriter],
+        path: str | None = None,
+        clock=time.monotonic,
+    ):
+        # used in place of the class name, e.g. as a metric label
+        self.name = name
+        self.factory = factory
+        self.path = path
+        self.clock = clock
+        self._writer: BlobWriter | None = None
+        self._failed_at: float | None = None
+        self._lock = threading.Lock()
+
+    def _build(self) -> BlobWriter:
+        with self._lock:
+            if self._writer is None:
+                logger.debug("Building blob writer: %s", self.name)
+                self._writer = self.factory()
+
+        return self._writer
+
+    async def _get_writer(self) -> BlobWriter:
+        if self._writer is None:
+            return await asyncio.to_thread(self._build)
+
+        return self._writer
+
+    async def ready(self) -> bool:
+        if self._writer is not None:
+            return await self._writer.ready()
+
+        now = self.clock()
+        if self._failed_at is not None and now - self._failed_at < self.retry_interval:
+            return False
+
+        try:
+            writer = await self._get_writer()
+
+        except Exception as e:
+            self._failed_at = now
+            logger.warning("Failed to build blob writer %s: %s", self.name, e)
+            return False
+
+        return await writer.ready()
+
+    async def put_object(self, key: str, body: bytes) -> None:
+        writer = await self._get_writer()
+        await writer.put_object(key, body)
+
+    def make_key(self, timestamp: datetime) -> str:
+        return make_key(timestamp, self.path)
+
+    async def warm_up(self) -> None:
+        writer = await self._get_writer()
+        await writer.warm_up()
+
+    async def drain(self, timeout: float | None = None) -> bool:
+        if self._writer is None:
+            return True
+
+        return await self._writer.drain(timeout)
@@ -1,7 +1,12 @@
 import asyncio
 
+from . import metrics
+from .dedup import DedupIndex
 from .events_writer import AsyncEventsWriter
-from .transformer import extract_events_from_log
+from .sidecar import SidecarEventsWriter
+from .profiling import timed
+from .transformer import extract_events_from_log, slim_log
+from .utils import boolean, get_env, positive_int
 from .logging import get_logger
 
 
@@ -15,12 +20,51 @@ class Callback:
     them asynchronously.
 
     See: https://docs.litellm.ai/docs/proxy/logging
+
+    When `deferred_transform` is set, the request path only keeps a slim copy
+    of the log, and a background task turns the pending logs into events in
+    batches of `transform_batch_size`. At most `max_pending_logs` wait for
+    it, after which new logs are dropped.
+
+    When the `dedup` index is enabled, logs whose id was already handled
+    within its window are dropped, since LiteLLM may call the callback more
+    than once for the same request.
     """
 
     __name__ = "amberflo-callback"
 
-    def __init__(self, writer: AsyncEventsWriter):
+    def __init__(
+        self,
+        writer: AsyncEventsWriter | SidecarEventsWriter,
+        deferred_transform: bool = False,
+        transform_batch_size: int = 100,
+        dedup: DedupIndex | None = None,
+        max_pending_logs: int = 10000,
+    ):
         self.writer = writer
+        self.dedup = dedup if dedup is not None else DedupIndex()
+
+        self.deferred_transform = bool(
+            get_env("AFLO_DEFERRED_TRANSFORM", deferred_transform, validate=boolean)
+        )
+        self.transform_batch_size = int(
+            get_env(
+                "AFLO_TRANSFORM_BATCH_SIZE", transform_batch_size, validate=positive_int
+            )
+        )
+        self.max_pending_logs = int(
+            get_env("AFLO_MAX_PENDING_LOGS", max_pending_logs, validate=positive_int)
+        )
+
+        self._pending_logs: list[dict] = []
+        self._logs_pending: asyncio.Event | None = None
+        self._transform_task: asyncio.Task | None = None
+        self._closing = False
+
+        # Keep references to the pending writes, so that they are not garbage
+        # collected before completion, and can be waited on.
+        self._tasks: set[asyncio.Task] = set()
+
         logger.debug("Callback initialized")
 
     async def __call__(self, *args, **kwargs) -> None:
@@ -43,11 +87,103 @@ class Callback:
         """
         pass
 
+    @property
+    def logs_pending(self) -> asyncio.Event:
+        """
+        Lazy initialization of asyncio.Event to avoid event loop issues.
+        """
+        if self._logs_pending is None:
+            self._logs_pending = asyncio.Event()
+        return self._logs_pending
+
+    @timed("callback.handle_log")
     def _handle_log_object(self, log):
         logger.debug("Handling log object: %s", log)
 
+        if self.dedup.ttl and log.get("id") and self.dedup.seen(log["id"]):
+            logger.debug("Dropping duplicate log object: %s", log["id"])
+            metrics.duplicates_dropped.inc()
+            return
+
+        if self.deferred_transform:
+            self._defer(log)
+            return
+
         events = extract_events_from_log(log)
 
-        if events:
+        if events and self.writer.writes_nowait:
+            self.writer.write_nowait(events)
+
+        elif events:
             # Avoid blocking
-            asyncio.create_task(self.writer.async_write(events))
+            task = asyncio.create_task(self.writer.async_write(events))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def _defer(self, log):
+        # (Re)start the task, if it is not running, e.g. after shutdown
+        if self._transform_task is None or self._transform_task.done():
+            self._transform_task = asyncio.create_task(self._transform_pending())
+
+        if len(self._pending_logs) >= self.max_pending_logs:
+            logger.warning(
+                "Dropping log due to too many logs pending transform (capacity: %s)",
+                self.max_pending_logs,
+            )
+            metrics.events_dropped.inc(reason="transform_pending_full")
+            return
+
+        self._pending_logs.append(slim_log(log))
+        self.logs_pending.set()
+
+    async def _transform_pending(self):
+        """
+        Background task that transforms the pending logs, until shutdown.
+        """
+        while True:
+            await self.logs_pending.wait()
+            self.logs_pending.clear()
+
+            await self._transform_batches()
+
+            if self._closing:
+                return
+
+    async def _transform_batches(self):
+        while self._pending_logs:
+            logs = self._pending_logs[: self.transform_batch_size]
+            del self._pending_logs[: self.transform_batch_size]
+
+            events = self._transform(logs)
+
+            if events:
+                await self.writer.async_write(events)
+
+            # Let the request path run between batches
+            await asyncio.sleep(0)
+
+    @timed("callback.transform")
+    def _transform(self, logs) -> list:
+        events = []
+        for log in logs:
+            try:
+                events.extend(extract_events_from_log(log) or ())
+            except Exception:
+                logger.exception("Failed to transform log %s", log.get("id"))
+
+        return events
+
+    async def shutdown(self, timeout: float | None = 30) -> bool:
+        """
+        Transform the pending logs and wait for the pending writes, then flush
+        and drain the writer.
+        """
+        if self._transform_task:
+            self._closing = True
+            self.logs_pending.set()
+            await asyncio.wait([self._transform_task], timeout=timeout)
+
+        if self._tasks:
+            await asyncio.wait(self._tasks, timeout=timeout)
+
+        return await self.writer.shutdown(timeout)
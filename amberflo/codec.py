@@ -0,0 +1,133 @@
+"""
+Encoding of the batches of events, as gzip compressed JSON arrays.
+
+The JSON encoder is pluggable: the fastest one installed is used, unless one
+is chosen with `AFLO_JSON_CODEC`. They all produce valid JSON for the same
+events, though not byte for byte the same (e.g. whitespace, escaping of
+non-ASCII characters).
+"""
+
+import gzip
+import json
+
+from .event_record import to_json_default
+from .utils import get_env, positive_int
+
+
+class JsonCodec:
+    """
+    Encoder of the standard library.
+    """
+
+    name = "json"
+
+    def dumps(self, obj) -> bytes:
+        return json.dumps(obj, default=to_json_default).encode()
+
+    def loads(self, data: bytes):
+        return json.loads(data)
+
+
+class OrjsonCodec:
+    name = "orjson"
+
+    def __init__(self) -> None:
+        import orjson  # pyright: ignore[reportMissingImports]
+
+        self._orjson = orjson
+        self._options = orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, obj) -> bytes:
+        return self._orjson.dumps(obj, default=to_json_default, option=self._options)
+
+    def loads(self, data: bytes):
+        return self._orjson.loads(data)
+
+
+class MsgspecCodec:
+    name = "msgspec"
+
+    def __init__(self) -> None:
+        import msgspec  # pyright: ignore[reportMissingImports]
+
+        self._encoder = msgspec.json.Encoder(enc_hook=to_json_default)
+        self._decoder = msgspec.json.Decoder()
+
+    def dumps(self, obj) -> bytes:
+        return self._encoder.encode(obj)
+
+    def loads(self, data: bytes):
+        return self._decoder.decode(data)
+
+
+Codec = JsonCodec | OrjsonCodec | MsgspecCodec
+
+_codecs = {c.name: c for c in (OrjsonCodec, MsgspecCodec, JsonCodec)}
+
+# built codecs, by name
+_instances: dict[str, Codec] = {}
+
+
+def get_codec(name: str | None = None) -> Codec:
+    """
+    Returns the named codec, or else the one chosen by `AFLO_JSON_CODEC`. The
+    "auto" codec is the first one installed among orjson, msgspec and json.
+    """
+    name = str(get_env("AFLO_JSON_CODEC", name or "auto")).lower()
+
+    codec = _instances.get(name)
+    if codec is not None:
+        return codec
+
+    if name == "auto":
+        codec = _first_installed()
+
+    elif name in _codecs:
+        try:
+            codec = _codecs[name]()
+        except ImportError:
+            raise ValueError(f"AFLO_JSON_CODEC {name} is not installed")
+
+    else:
+        raise ValueError(f"Unsupported AFLO_JSON_CODEC: {name}")
+
+    _instances[name] = codec
+    return codec
+
+
+def _first_installed() -> Codec:
+    for cls in _codecs.values():
+        try:
+            return cls()
+        except ImportError:
+            pass
+
+    return JsonCodec()
+
+
+default_gzip_level = 9
+
+
+def get_gzip_level(level: int | None = None) -> int:
+    """
+    Returns the given gzip compression level, or else `AFLO_GZIP_LEVEL`.
+    """
+    level = int(
+        get_env("AFLO_GZIP_LEVEL", level or default_gzip_level, validate=positive_int)
+    )
+
+    if not 1 <= level <= 9:
+        raise ValueError(f"AFLO_GZIP_LEVEL must be between 1 and 9, got: {level}")
+
+    return level
+
+
+def encode(events, codec: Codec, level: int) -> bytes:
+    """
+    Encodes the events as a gzip compressed JSON array.
+    """
+    return gzip.compress(codec.dumps(events), level)
+
+
+def decode(body: bytes, codec: Codec):
+    return codec.loads(gzip.decompress(body))
@@ -0,0 +1,56 @@
+import time
+from collections import OrderedDict
+
+from .utils import get_env, positive_float, positive_int
+
+
+class DedupIndex:
+    """
+    Remembers the keys seen in the last `ttl` seconds, up to `max_size` of
+    them, to tell apart the duplicates.
+
+    Keys are forgotten in the order they were first seen, once they are older
+    than `ttl`, or to make room for new ones, so memory stays bounded.
+
+    A `ttl` of zero disables the index.
+    """
+
+    def __init__(self, ttl: float = 0, max_size: int = 100000, clock=time.monotonic):
+        self.ttl = float(get_env("AFLO_DEDUP_WINDOW", ttl, validate=positive_float))
+        self.max_size = int(
+            get_env("AFLO_DEDUP_MAX_SIZE", max_size, validate=positive_int)
+        )
+        self.clock = clock
+        # key -> time first seen, oldest first
+        self._seen: OrderedDict[str, float] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+    def seen(self, key: str) -> bool:
+        """
+        Return whether the key was seen already, and remember it otherwise.
+        """
+        now = self.clock()
+        self._expire(now)
+
+        if key in self._seen:
+            return True
+
+        self._seen[key] = now
+
+        if len(self._seen) > self.max_size:
+            self._seen.popitem(last=False)
+
+        return False
+
+    def _expire(self, now: float) -> None:
+        deadline = now - self.ttl
+
+        while self._seen:
+            key, first_seen = next(iter(self._seen.items()))
+
+            if first_seen > deadline:
+                break
+
+            del self._seen[key]
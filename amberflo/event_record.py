@@ -0,0 +1,126 @@
+"""
+Compact in-memory representation of Amberflo meter events.
+
+The transformer produces one dictionary per event, each with its own copy of
+the dimensions. Buffered events are converted to `EventRecord` objects, which
+share interned dimension sets, and are only turned back into dictionaries
+when the batch is serialized.
+"""
+
+# Bound on the number of distinct dimension sets kept for interning. When it
+# is reached the table is reset, which only costs some sharing.
+_max_dimension_sets = 10000
+
+_dimension_sets: dict[tuple, tuple] = {}
+
+
+class EventRecord:
+    """
+    A meter event. Dimensions are stored as an interned tuple of items.
+    """
+
+    __slots__ = ("time", "unique_id", "meter", "value", "dimensions")
+
+    def __init__(self, time, unique_id, meter, value, dimensions: tuple | None) -> None:
+        self.time = time
+        self.unique_id = unique_id
+        self.meter = meter
+        self.value = value
+        self.dimensions = dimensions
+
+    @classmethod
+    def from_dict(cls, event: dict) -> "EventRecord":
+        return cls(
+            event.get("meterTimeInMillis"),
+            event.get("uniqueId"),
+            event.get("meterApiName"),
+            event.get("meterValue"),
+            intern_dimensions(event.get("dimensions")),
+        )
+
+    def to_dict(self) -> dict:
+        """
+        Returns the event in the shape expected by the backends.
+        """
+        event = {}
+
+        if self.time is not None:
+            event["meterTimeInMillis"] = self.time
+
+        if self.unique_id is not None:
+            event["uniqueId"] = self.unique_id
+
+        if self.meter is not None:
+            event["meterApiName"] = self.meter
+
+        if self.value is not None:
+            event["meterValue"] = self.value
+
+        if self.dimensions is not None:
+            event["dimensions"] = dict(self.dimensions)
+
+        return event
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, EventRecord):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __repr__(self) -> str:
+        return f"EventRecord({self.to_dict()})"
+
+
+def intern_dimensions(dimensions: dict | None) -> tuple | None:
+    """
+    Returns a shared tuple for the given dimensions.
+    """
+    if dimensions is None:
+        return None
+
+    # Dimensions built by the transformer always have the same key order,
+    # so there is no need to pay for sorting them.
+    key = tuple(dimensions.items())
+
+    shared = _dimension_sets.get(key)
+    if shared is None:
+        if len(_dimension_sets) >= _max_dimension_sets:
+            _dimension_sets.clear()
+
+        _dimension_sets[key] = shared = key
+
+    return shared
+
+
+def to_json_default(obj):
+    """
+    Hook for `json.dumps` to serialize event records.
+    """
+    if isinstance(obj, EventRecord):
+        return obj.to_dict()
+
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+# Size of the keys, numbers and punctuation of a serialized event
+_event_overhead = 105
+
+
+def estimate_size(event: "dict | EventRecord") -> int:
+    """
+    Cheap estimate of the size of the serialized event, in bytes.
+    """
+    if isinstance(event, EventRecord):
+        unique_id, meter, dimensions = event.unique_id, event.meter, event.dimensions
+    else:
+        unique_id = event.get("uniqueId")
+        meter = event.get("meterApiName")
+        dimensions = event.get("dimensions")
+        dimensions = dimensions.items() if dimensions else None
+
+    size = _event_overhead + len(unique_id or "") + len(meter or "")
+
+    if dimensions:
+        # "key": "value", per dimension
+        size += sum(len(k) + len(str(v)) + 8 for k, v in dimensions)
+
+    return size
@@ -1,22 +1,81 @@
-from asyncio import Lock
+import asyncio
+import hashlib
+import uuid
+import zlib
+from asyncio import Condition, Lock
+from collections import deque
+from collections.abc import Callable
 from datetime import datetime, timezone
 
+from . import metrics
+from .codec import get_codec, get_gzip_level
+from .event_record import EventRecord, estimate_size
+from .profiling import timed
 from .logging import get_logger
 
 
 logger = get_logger(__name__)
 
 
+class CompressedBatch:
+    """
+    A batch of events that has already been encoded and compressed.
+    """
+
+    def __init__(self, body: bytes, count: int) -> None:
+        self.body = body
+        self.count = count
+
+    def __len__(self) -> int:
+        return self.count
+
+
+Batch = deque[dict | EventRecord] | CompressedBatch
+
+
 class EventsBuffer:
     """
     Manages event buffering and thread-safe operations.
+
+    When `compact` is set, events are stored as `EventRecord` objects that
+    share their dimensions, instead of as dictionaries.
+
+    What happens when events do not fit depends on the `overflow` policy:
+    - "drop-new": the incoming events are dropped;
+    - "drop-oldest": the oldest events are dropped to make room;
+    - "block": adding waits up to `block_timeout` seconds for a flush to make
+      room, then drops the incoming events.
+
+    Dropped events are handed to `on_drop`, if set.
+
+    When `track_bytes` is set, the buffer keeps an estimate of the size of its
+    events once serialized, in `estimated_bytes`.
     """
 
-    def __init__(self, max_buffer_size: int = 10000) -> None:
-        self.buffer: list[dict] = []
+    overflow_policies = ("drop-new", "drop-oldest", "block")
+
+    def __init__(
+        self,
+        max_buffer_size: int = 10000,
+        compact: bool = False,
+        overflow: str = "drop-new",
+        block_timeout: float = 1,
+    ) -> None:
+        if overflow not in self.overflow_policies:
+            raise ValueError(f"Unsupported overflow policy: {overflow}")
+
+        self.buffer: deque[dict | EventRecord] = deque()
         self.max_buffer_size = max_buffer_size
+        self.compact = compact
+        self.overflow = overflow
+        self.block_timeout = block_timeout
         self.first_entry_time: datetime | None = None
+        self.on_drop: Callable[[list], None] | None = None
+        self.track_bytes = False
+        self.estimated_bytes = 0
+        self.last_batch_bytes = 0
         self._buffer_lock: Lock | None = None
+        self._space_available: Condition | None = None
 
     @property
     def buffer_lock(self) -> Lock:
@@ -27,33 +86,269 @@ class EventsBuffer:
             self._buffer_lock = Lock()
         return self._buffer_lock
 
+    @property
+    def space_available(self) -> Condition:
+        """
+        Lazy initialization of asyncio.Condition to avoid event loop issues.
+        """
+        if self._space_available is None:
+            self._space_available = Condition(self.buffer_lock)
+        return self._space_available
+
     async def add_events(self, events: list[dict]) -> int:
         """
         Add events to buffer. Return buffer size to allow client to trigger a
         flush based on buffer size.
         """
         async with self.buffer_lock:
-            if len(self.buffer) + len(events) > self.max_buffer_size:
-                logger.warning(
-                    f"Dropping {len(events)} events due to buffer being full (capacity: {self.max_buffer_size}, size: {len(self.buffer)}"
-                )
-                return len(self.buffer)
+            size = self._size()
+
+            if size + len(events) > self.max_buffer_size:
+                if self.overflow == "block":
+                    try:
+                        await asyncio.wait_for(
+                            self.space_available.wait_for(lambda: self._fits(events)),
+                            self.block_timeout,
+                        )
+                    except TimeoutError:
+                        pass
+
+                    size = self._size()
+
+                excess = size + len(events) - self.max_buffer_size
+
+                if excess <= 0:
+                    pass
+
+                elif self.overflow == "drop-oldest" and excess <= size:
+                    self._drop(self._evict(excess))
+
+                else:
+                    self._drop(events)
+                    return size
 
             if not self.first_entry_time:
                 self.first_entry_time = datetime.now(timezone.utc)
 
-            self.buffer.extend(events)
-            return len(self.buffer)
+            self._add(events)
+            return self._size()
 
-    async def extract_all(self) -> tuple[list[dict], datetime | None]:
+    @property
+    def size(self) -> int:
+        """
+        Number of buffered events.
+        """
+        return self._size()
+
+    async def extract_all(self) -> tuple[Batch, datetime | None]:
         """
         Extract all events from buffer and reset state.
+
+        The buffered events are returned as they are, without copying them
+        while holding the lock.
         """
         async with self.buffer_lock:
-            events = self.buffer.copy()
+            events = self._take()
             first_time = self.first_entry_time
 
-            self.buffer.clear()
             self.first_entry_time = None
+            self.last_batch_bytes = self.estimated_bytes
+            self.estimated_bytes = 0
+
+            self.space_available.notify_all()
 
             return events, first_time
+
+    def _fits(self, events: list[dict]) -> bool:
+        return self._size() + len(events) <= self.max_buffer_size
+
+    def _drop(self, events: list) -> None:
+        logger.warning(
+            "Dropping %s events due to buffer being full (capacity: %s, size: %s)",
+            len(events),
+            self.max_buffer_size,
+            self._size(),
+        )
+        metrics.events_dropped.inc(len(events), reason="buffer_full")
+        if self.on_drop:
+            self.on_drop(events)
+
+    def _size(self) -> int:
+        return len(self.buffer)
+
+    def _take(self) -> Batch:
+        """
+        Return the buffered events and reset the buffer.
+        """
+        events, self.buffer = self.buffer, deque()
+        return events
+
+    def _evict(self, count: int) -> list:
+        """
+        Remove and return the oldest `count` events.
+        """
+        # Popping from the left of a deque does not move the other events
+        evicted = [self.buffer.popleft() for _ in range(count)]
+
+        if self.track_bytes:
+            self.estimated_bytes -= sum(map(estimate_size, evicted))
+
+        return evicted
+
+    @timed("buffer.append")
+    def _add(self, events: list[dict]) -> None:
+        # timed here, as `_append` is overridden
+        self._append(events)
+
+    def _append(self, events: list[dict]) -> None:
+        if self.compact:
+            self.buffer.extend(map(EventRecord.from_dict, events))
+        else:
+            self.buffer.extend(events)
+
+        if self.track_bytes:
+            self.estimated_bytes += sum(map(estimate_size, events))
+
+
+# These meters describe objects rather than usage, so adding them up makes no
+# sense: identical events are collapsed instead.
+_non_additive_meters = {"aflo.object_metadata"}
+
+
+class RollupEventsBuffer(EventsBuffer):
+    """
+    Events buffer that pre-aggregates events as they are added.
+
+    Events with the same meter, dimensions and time bucket are merged into a
+    single event whose value is the sum of their values, and whose time is the
+    start of the bucket.
+
+    The merged event gets a `uniqueId` of its own, derived from its meter,
+    bucket and dimensions, the buffer and the number of the flush, so that no
+    two aggregates share one, even across flushes and workers. Since the ids
+    of the events are lost, a re-delivered request is added to the sum: drop
+    them before the buffer with `AFLO_DEDUP_WINDOW`.
+
+    Aggregates are always stored as `EventRecord` objects, whose interned
+    dimensions double as the aggregation key.
+    """
+
+    overflow_policies = ("drop-new", "block")
+
+    def __init__(
+        self,
+        max_buffer_size: int = 10000,
+        granularity: int = 60,
+        overflow: str = "drop-new",
+        block_timeout: float = 1,
+    ) -> None:
+        super().__init__(max_buffer_size, True, overflow, block_timeout)
+        self.granularity_ms = granularity * 1000
+        self._index: dict[tuple, EventRecord] = {}
+
+        # make the ids of the aggregates unique per buffer and flush
+        self._buffer_id = uuid.uuid4().hex
+        self._flushes = 0
+
+    def _append(self, events: list[dict]) -> None:
+        for event in events:
+            record = EventRecord.from_dict(event)
+            record.time -= record.time % self.granularity_ms
+
+            key = (record.meter, record.time, record.dimensions)
+
+            aggregate = self._index.get(key)
+
+            if aggregate is None:
+                if record.meter not in _non_additive_meters:
+                    record.unique_id = self._aggregate_id(key)
+
+                self._index[key] = record
+                self.buffer.append(record)
+
+                if self.track_bytes:
+                    self.estimated_bytes += estimate_size(record)
+
+            elif record.meter not in _non_additive_meters:
+                aggregate.value += record.value
+
+    def _aggregate_id(self, key: tuple) -> str:
+        data = repr((self._buffer_id, self._flushes, key)).encode()
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+    def _take(self) -> Batch:
+        self._index = {}
+        self._flushes += 1
+        return super()._take()
+
+
+class StreamingEventsBuffer(EventsBuffer):
+    """
+    Events buffer that encodes and compresses events as they are added.
+
+    Instead of the events, it keeps a running gzip stream of the JSON array
+    being built, so extracting the buffer only has to finalize the stream.
+    This spreads the compression work over time and avoids holding the
+    events, their JSON and the compressed body in memory at once.
+
+    The size of the events is always tracked, since it is known exactly.
+    """
+
+    overflow_policies = ("drop-new", "block")
+
+    def __init__(
+        self,
+        max_buffer_size: int = 10000,
+        compression_level: int | None = None,
+        overflow: str = "drop-new",
+        block_timeout: float = 1,
+    ) -> None:
+        super().__init__(max_buffer_size, False, overflow, block_timeout)
+        self.compression_level = get_gzip_level(compression_level)
+        self.codec = get_codec()
+        self.track_bytes = True
+        self._count = 0
+        self._chunks: list[bytes] = []
+        self._compressor = self._new_compressor()
+
+    def _new_compressor(self):
+        # wbits=31 selects the gzip container, same as `gzip.compress`
+        return zlib.compressobj(self.compression_level, zlib.DEFLATED, 31)
+
+    def _append(self, events: list[dict]) -> None:
+        if not events:
+            return
+
+        # Encode all the events at once, without the enclosing brackets
+        encoded = self.codec.dumps(events)[1:-1]
+        data = (b"," if self._count else b"[") + encoded
+
+        self.estimated_bytes += len(data)
+        self._count += len(events)
+
+        chunk = self._compressor.compress(data)
+        if chunk:
+            self._chunks.append(chunk)
+
+    def _size(self) -> int:
+        return self._count
+
+    def _take(self) -> Batch:
+        if not self._count:
+            return CompressedBatch(b"", 0)
+
+        self._chunks.append(self._compressor.compress(b"]"))
+        self._chunks.append(self._compressor.flush())
+
+        body = b"".join(self._chunks)
+
+        ratio = len(body) / (self.estimated_bytes + 1)
+        logger.debug(f"Events file size: {len(body)} (compression ratio: {ratio:.2f})")
+
+        batch = CompressedBatch(body, self._count)
+
+        self._count = 0
+        self._chunks = []
+        self._compressor = self._new_compressor()
+
+        return batch
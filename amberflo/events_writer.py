@@ -1,11 +1,19 @@
 import asyncio
-import json
 import gzip
-from datetime import datetime
+import multiprocessing
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timezone
 from typing import cast
 
+from . import metrics
 from .blob_client import BlobWriter
-from .events_buffer import EventsBuffer
+from .codec import get_codec, get_gzip_level
+from .events_buffer import CompressedBatch, EventsBuffer
+from .flush_scheduler import FlushScheduler
+from .profiling import LoopLagMonitor, timed
+from .spill_store import SpillStore
+from .upload_scheduler import UploadScheduler
 from .utils import get_env
 from .utils import positive_int
 from .logging import get_logger
@@ -22,6 +30,23 @@ class AsyncEventsWriter:
     Also:
     - formats the "key" and "body" of the blob to be written;
     - manages the buffering of events, and graceful shutdown.
+
+    The body of the blob is encoded and compressed either inline, on the event
+    loop, or in a dedicated "thread" or "process" pool, depending on the
+    `serializer` setting.
+
+    When a `spill` store is given, batches that fail to upload, and events
+    dropped because the buffer is full, are written to disk and replayed in
+    the background.
+
+    When to flush is decided by a `FlushScheduler`, from the batch size and
+    the flush interval. Besides, the buffer is flushed when its estimated
+    compressed size reaches `target_object_bytes`, if set. The compression
+    ratio used for the estimate is learnt from previous flushes.
+
+    When `queue_size` is set, `write_nowait` enqueues the events in a bounded
+    queue instead, and a single long-lived task adds them to the buffer and
+    drives the flushes, so that no task is created per write.
     """
 
     def __init__(
@@ -30,9 +55,25 @@ class AsyncEventsWriter:
         buffer: EventsBuffer,
         flush_interval=60,
         batch_size=200,
+        serializer="inline",
+        serializer_workers=1,
+        spill: SpillStore | None = None,
+        target_object_bytes=0,
+        queue_size=0,
+        codec: str | None = None,
+        gzip_level: int | None = None,
     ):
         self.client = client
         self.buffer = buffer
+        self.spill = spill
+
+        self.uploads = UploadScheduler(
+            client, on_failure=spill.spill if spill else None
+        )
+
+        self._dropped: list[dict] = []
+        if spill:
+            buffer.on_drop = self._dropped.extend
 
         self.flush_interval = int(
             get_env("AFLO_FLUSH_INTERVAL", flush_interval, validate=positive_int)
@@ -41,17 +82,77 @@ class AsyncEventsWriter:
             get_env("AFLO_BATCH_SIZE", batch_size, validate=positive_int)
         )
 
+        self.target_object_bytes = int(
+            get_env(
+                "AFLO_TARGET_OBJECT_BYTES", target_object_bytes, validate=positive_int
+            )
+        )
+        if self.target_object_bytes:
+            buffer.track_bytes = True
+
+        # Leave room in the buffer for the events arriving while flushing
+        self.flush_scheduler = FlushScheduler(
+            self.batch_size, self.flush_interval, buffer.max_buffer_size // 2
+        )
+
+        # initial guess, refined on every flush
+        self.compression_ratio = 0.1
+
+        # when to ask the client again whether it is ready, once it was not
+        self._not_ready_until = 0.0
+
+        self.serializer = str(get_env("AFLO_SERIALIZER", serializer)).lower()
+        if self.serializer not in _serializers:
+            raise ValueError(f"Unsupported AFLO_SERIALIZER: {self.serializer}")
+
+        self.serializer_workers = int(
+            get_env(
+                "AFLO_SERIALIZER_WORKERS", serializer_workers, validate=positive_int
+            )
+        )
+        self._executor: Executor | None = None
+
+        self.codec = get_codec(codec)
+        self.gzip_level = get_gzip_level(gzip_level)
+
+        self.queue_size = int(
+            get_env("AFLO_INGEST_QUEUE_SIZE", queue_size, validate=positive_int)
+        )
+        self._ingest_queue: asyncio.Queue | None = None
+
+        self.lag_monitor = LoopLagMonitor()
+
         # Coordination elements will be lazily initialized to avoid issues with
         # event loop not being ready
         self.flush_task: asyncio.Task | None = None
+        self.replay_task: asyncio.Task | None = None
+        self.warm_up_task: asyncio.Task | None = None
+        self.ingest_task: asyncio.Task | None = None
+        self.lag_task: asyncio.Task | None = None
         self._flush_lock: asyncio.Lock | None = None
         self._initialized = False
         logger.debug(
-            "Async events writer initialized: flush_interval: %s, batch_size: %s",
+            "Async events writer initialized: flush_interval: %s, batch_size: %s, target_object_bytes: %s, serializer: %s, queue_size: %s",
             self.flush_interval,
             self.batch_size,
+            self.target_object_bytes,
+            self.serializer,
+            self.queue_size,
         )
 
+        # Replay the batches left over by a previous process right away, if
+        # built on the event loop (as LiteLLM does when loading the callback),
+        # rather than on the first write.
+        if spill and _loop_is_running():
+            self._start()
+
+    @property
+    def writes_nowait(self) -> bool:
+        """
+        Whether `write_nowait` can be used instead of `async_write`.
+        """
+        return bool(self.queue_size)
+
     @property
     def flush_lock(self) -> asyncio.Lock:
         """
@@ -61,14 +162,65 @@ class AsyncEventsWriter:
             self._flush_lock = asyncio.Lock()
         return self._flush_lock
 
+    @property
+    def ingest_queue(self) -> asyncio.Queue:
+        """
+        Lazy initialization of asyncio.Queue to avoid event loop issues.
+        """
+        if self._ingest_queue is None:
+            self._ingest_queue = asyncio.Queue(self.queue_size)
+        return self._ingest_queue
+
+    @property
+    def executor(self) -> Executor:
+        """
+        Lazy initialization of the serializer pool, so that no threads or
+        processes are started unless they are used.
+        """
+        if self._executor is None:
+            if self.serializer == "process":
+                # Not forked, as by then the process runs threads (e.g. the
+                # logging listener), whose locks a fork could copy held
+                self._executor = ProcessPoolExecutor(
+                    self.serializer_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    self.serializer_workers, thread_name_prefix="aflo-serializer"
+                )
+        return self._executor
+
     async def async_init(self) -> None:
+        self._start()
+
+    def _start(self) -> None:
+        """
+        Start the background tasks. Must be called from the event loop.
+        """
         if not self._initialized:
             self._initialized = True
 
             loop = asyncio.get_running_loop()
             self.flush_task = loop.create_task(self._periodic_flush())
+            self.warm_up_task = loop.create_task(self._warm_up())
+
+            if self.queue_size:
+                self.ingest_task = loop.create_task(self._consume())
+
+            if self.lag_monitor.interval:
+                self.lag_task = loop.create_task(self.lag_monitor.run())
+
+            if self.spill:
+                self.replay_task = loop.create_task(self.spill.run(self.client))
             logger.debug("Async event writer async initialization completed")
 
+    async def _warm_up(self) -> None:
+        try:
+            await self.client.warm_up()
+        except Exception:
+            logger.exception("Failed to warm up client")
+
     async def async_write(self, events):
         """
         Adds the event to a buffer for asynchronously sending them.
@@ -77,38 +229,168 @@ class AsyncEventsWriter:
 
         logger.debug(f"Received {len(events)} events to write asynchronously")
 
+        await self._ingest(events)
+
+    def write_nowait(self, events) -> None:
+        """
+        Enqueues the events without waiting, for the ingestion task to add
+        them to the buffer. Requires `queue_size` to be set.
+
+        When the queue is full, the events are dropped.
+        """
+        self._start()
+
+        try:
+            self.ingest_queue.put_nowait(events)
+        except asyncio.QueueFull:
+            logger.warning(
+                "Dropping %s events due to ingestion queue being full (capacity: %s)",
+                len(events),
+                self.queue_size,
+            )
+            metrics.events_dropped.inc(len(events), reason="queue_full")
+            if self.buffer.on_drop:
+                self.buffer.on_drop(events)
+
+    async def _consume(self) -> None:
+        """
+        Background task that moves the enqueued events to the buffer, merging
+        the writes that are waiting into a single one, up to a batch.
+        """
+        queue = self.ingest_queue
+
+        while True:
+            events = list(await queue.get())
+            count = 1
+
+            while len(events) < self.batch_size and not queue.empty():
+                events.extend(queue.get_nowait())
+                count += 1
+
+            try:
+                await self._ingest(events)
+            finally:
+                for _ in range(count):
+                    queue.task_done()
+
+    async def _ingest(self, events) -> None:
+        metrics.events_received.inc(len(events))
+        self.flush_scheduler.observe(len(events))
+
         try:
             buffer_size = await self.buffer.add_events(events)
+            metrics.buffer_events.set(buffer_size)
 
-            if buffer_size >= self.batch_size:
-                logger.debug(
-                    f"Buffer reached batch size ({buffer_size} >= {self.batch_size}), flushing..."
-                )
-                async with self.flush_lock:
-                    await self._flush_buffer()
+            if len(self._dropped) >= self.batch_size:
+                await self._spill_dropped()
+
+            # Skip if a flush is already running (e.g. waiting for room in the
+            # upload queue) instead of piling up behind it.
+            if self._should_flush(buffer_size) and not self.flush_lock.locked():
+                await self._flush()
 
         except Exception:
             logger.exception("Failed to write events async")
 
+    def _should_flush(self, buffer_size: int) -> bool:
+        target_events = self.flush_scheduler.target_events
+
+        if buffer_size >= target_events:
+            logger.debug(
+                f"Buffer reached batch size ({buffer_size} >= {target_events}), flushing..."
+            )
+            return True
+
+        if self.target_object_bytes:
+            estimate = self.buffer.estimated_bytes * self.compression_ratio
+
+            if estimate >= self.target_object_bytes:
+                logger.debug(
+                    f"Buffer reached target object size ({estimate:.0f} >= {self.target_object_bytes}), flushing..."
+                )
+                return True
+
+        return False
+
+    async def shutdown(self, timeout: float | None = 30) -> bool:
+        """
+        Flush the buffer and wait for the uploads to complete. Return whether
+        they did within the timeout.
+        """
+        if self.ingest_task:
+            try:
+                await asyncio.wait_for(self.ingest_queue.join(), timeout)
+            except TimeoutError:
+                logger.warning(
+                    "Timed out with %s writes left in the ingestion queue",
+                    self.ingest_queue.qsize(),
+                )
+
+            self.ingest_task.cancel()
+            await asyncio.gather(self.ingest_task, return_exceptions=True)
+            self.ingest_task = None
+
+        if self.flush_task:
+            self.flush_task.cancel()
+
+            # the task flushes the buffer upon cancellation, after the flush in
+            # progress, if any, which is never interrupted
+            await asyncio.gather(self.flush_task, return_exceptions=True)
+            self.flush_task = None
+
+        # Also flush here, as a task cancelled before it started never runs
+        await self._flush()
+
+        if self.buffer.size:
+            await self._discard_buffer()
+
+        for task in (self.replay_task, self.warm_up_task, self.lag_task):
+            if task:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+
+        self.replay_task = None
+        self.warm_up_task = None
+        self.lag_task = None
+
+        self._initialized = False
+
+        completed = await self.uploads.drain(timeout)
+
+        # e.g. the uploads of a fan-out writer, which run apart per sink
+        completed = await self.client.drain(timeout) and completed
+
+        if self._executor:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+        return completed
+
     async def _periodic_flush(self) -> None:
         """
-        Background task for periodic flushing.
+        Background task for periodic flushing, as planned by the flush
+        scheduler.
         """
+        scheduler = self.flush_scheduler
+
         while True:
             try:
-                await asyncio.sleep(self.flush_interval)
+                delay = scheduler.next_delay(self.buffer.size, self._buffer_age())
+                await asyncio.sleep(delay)
+
+                # The adaptive scheduler polls while the buffer is empty
+                if scheduler.adaptive and not self.buffer.size:
+                    continue
 
                 logger.debug("Periodic flush timer triggered, flushing...")
 
-                async with self.flush_lock:
-                    await self._flush_buffer()
+                await self._flush()
 
             except asyncio.CancelledError:
                 logger.debug("Periodic flush task cancelled, flushing...")
 
                 # Flush remaining events in the queue before cancellation
-                async with self.flush_lock:
-                    await self._flush_buffer()
+                await self._flush()
 
                 # Propagate cancellation
                 raise
@@ -116,38 +398,185 @@ class AsyncEventsWriter:
             except Exception:
                 logger.exception("Error in async writer periodic flush")
 
+    def _buffer_age(self) -> float:
+        """
+        Seconds since the oldest buffered event was added, if any.
+        """
+        first_entry_time = self.buffer.first_entry_time
+        if first_entry_time is None:
+            return 0.0
+
+        return (datetime.now(timezone.utc) - first_entry_time).total_seconds()
+
+    async def _flush(self) -> None:
+        """
+        Flush the buffer once no other flush is running.
+
+        The flush runs to completion even if the caller is cancelled, since
+        the events are lost once extracted from the buffer.
+        """
+        await asyncio.shield(self._locked_flush())
+
+    async def _locked_flush(self) -> None:
+        async with self.flush_lock:
+            await self._flush_buffer()
+
     async def _flush_buffer(self) -> None:
         """
         Flush the current contents of the buffer.
         """
         key = None
+        start = time.perf_counter()
 
         try:
+            await self._spill_dropped()
+
+            # Keep the events until they can be written
+            if self.buffer.size and not await self._client_ready():
+                return
+
             events, first_entry_time = await self.buffer.extract_all()
+            metrics.buffer_events.set(self.buffer.size)
+
             if not events:
                 logger.debug("No events to flush")
                 return
 
+            metrics.events_flushed.inc(len(events))
+
+            batch_bytes = self.buffer.last_batch_bytes
+
             key = self.client.make_key(cast(datetime, first_entry_time))
 
             logger.info(f"Flushing {len(events)} events to: {key}")
 
-            body = _prepare_body(events)
+            if isinstance(events, CompressedBatch):
+                body, json_size = events.body, batch_bytes
+            else:
+                body, json_size = await self._encode(events)
 
-            # Avoid blocking
-            asyncio.create_task(self.client.put_object(key, body))
+            if json_size:
+                metrics.compression_ratio.set(len(body) / json_size)
+
+            if batch_bytes:
+                # Ratio to the estimate of the size, to estimate the size of
+                # the next objects. Smooth it out, as it varies between batches.
+                ratio = len(body) / batch_bytes
+                self.compression_ratio = 0.8 * self.compression_ratio + 0.2 * ratio
+
+            await self.uploads.submit(key, body)
+
+            metrics.flush_seconds.observe(time.perf_counter() - start)
 
         except asyncio.CancelledError:
-            logger.warning(f"Flushing cancelled: {key}")
+            logger.warning("Flushing cancelled: %s", key)
             raise
 
+    async def _client_ready(self) -> bool:
+        """
+        Whether the client is ready. Once it is not, it is not asked again
+        for a while, e.g. until the lazy client tries building again, so that
+        the flushes triggered in the meantime return right away.
+        """
+        now = time.monotonic()
+        if now < self._not_ready_until:
+            return False
+
+        if await self.client.ready():
+            return True
+
+        retry_interval = getattr(self.client, "retry_interval", 0)
+        self._not_ready_until = now + max(
+            retry_interval, self.flush_scheduler.min_interval
+        )
+
+        logger.warning("Keeping %s events until the backend is ready", self.buffer.size)
+        return False
+
+    async def _spill_dropped(self) -> None:
+        """
+        Write the events dropped by the buffer to the spill store.
+        """
+        if not self.spill or not self._dropped:
+            return
+
+        events, self._dropped = self._dropped, []
+
+        key = self.client.make_key(datetime.now(timezone.utc))
+
+        body, _ = await self._encode(events)
+
+        await self.spill.spill(key, body)
+
+    async def _discard_buffer(self) -> None:
+        """
+        Spill the events left in the buffer, if possible, or else drop them.
+        """
+        events, first_entry_time = await self.buffer.extract_all()
+
+        if not self.spill:
+            logger.error("Dropping %s events as the backend is not ready", len(events))
+            metrics.events_dropped.inc(len(events), reason="backend_not_ready")
+            return
+
+        if isinstance(events, CompressedBatch):
+            body = events.body
+        else:
+            body, _ = await self._encode(events)
+
+        key = self.client.make_key(first_entry_time or datetime.now(timezone.utc))
 
-def _prepare_body(events) -> bytes:
-    json_bytes = json.dumps(events).encode()
-    compressed = gzip.compress(json_bytes)
+        await self.spill.spill(key, body)
+
+    async def _encode(self, events) -> tuple[bytes, int]:
+        """
+        Encode and compress the events, off the event loop unless the
+        serializer is "inline". Return the body and the size of the JSON.
+        """
+        start = time.perf_counter()
+
+        # Only the name of the codec is passed, since it is sent to the
+        # serializer processes
+        args = (events, self.codec.name, self.gzip_level)
+
+        if self.serializer == "inline":
+            encoded = _prepare_body(*args)
+        else:
+            loop = asyncio.get_running_loop()
+            encoded = await loop.run_in_executor(self.executor, _prepare_body, *args)
+
+        metrics.encode_seconds.observe(
+            time.perf_counter() - start, serializer=self.serializer
+        )
+
+        return encoded
+
+
+_serializers = ("inline", "thread", "process")
+
+
+def _loop_is_running() -> bool:
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+# Not exported with the "process" serializer, as recorded in the workers
+@timed("writer.encode")
+def _prepare_body(
+    events, codec: str | None = None, level: int | None = None
+) -> tuple[bytes, int]:
+    """
+    Return the compressed JSON array of the events, and the size of the JSON.
+    """
+    # e.g. the deque of a buffer, copied here rather than under its lock
+    json_bytes = get_codec(codec).dumps(list(events))
+    compressed = gzip.compress(json_bytes, get_gzip_level(level))
 
     file_size = len(compressed)
     ratio = len(compressed) / len(json_bytes)
     logger.debug(f"Events file size: {file_size} (compression ratio: {ratio:.2f})")
 
-    return compressed
+    return compressed, len(json_bytes)
@@ -0,0 +1,131 @@
+import asyncio
+from collections.abc import Sequence
+from datetime import datetime
+
+from . import metrics
+from .blob_client import BlobWriter
+from .spill_store import SpillStore
+from .upload_scheduler import UploadScheduler
+from .logging import get_logger
+
+
+logger = get_logger(__name__)
+
+
+class FanOutWriter(BlobWriter):
+    """
+    Writes each blob to several blob storages, e.g. while migrating from one
+    to another, so that the events are buffered and compressed only once.
+
+    Each sink has its own `UploadScheduler`, so it retries and fails on its
+    own. Writing a blob only hands it to the schedulers, and a sink whose
+    queue is full does not hold up the others.
+
+    When `spill` is set, each sink has its own spill store, in a subdirectory
+    of `AFLO_SPILL_DIR` named after it, which keeps the blobs that failed to
+    upload, or found its queue full, and replays them to that sink only.
+    Otherwise, those blobs are dropped, and counted as failed uploads.
+
+    Each sink gets its own key for the blob, from its own `make_key`.
+    """
+
+    # keys of the sinks, kept from `make_key` until `put_object`
+    max_keys = 1024
+
+    def __init__(self, sinks: Sequence[BlobWriter], spill: bool = False):
+        if not sinks:
+            raise ValueError("FanOutWriter needs at least one sink")
+
+        self.sinks = list(sinks)
+        self.spills: list[SpillStore | None] = []
+        self.uploads: list[UploadScheduler] = []
+
+        for sink in self.sinks:
+            backend = getattr(sink, "name", type(sink).__name__)
+            store = SpillStore(subdirectory=backend) if spill else None
+
+            self.spills.append(store)
+            self.uploads.append(
+                UploadScheduler(sink, on_failure=store.spill if store else None)
+            )
+
+        self.name = "+".join(u.backend for u in self.uploads)
+
+        # key of the first sink -> keys of all the sinks
+        self._keys: dict[str, list[str]] = {}
+
+        self._replay_tasks: list[asyncio.Task] = []
+
+    def make_key(self, timestamp: datetime) -> str:
+        keys = [sink.make_key(timestamp) for sink in self.sinks]
+
+        # Keys of blobs that were never written, e.g. when encoding failed
+        if len(self._keys) >= self.max_keys:
+            del self._keys[next(iter(self._keys))]
+
+        self._keys[keys[0]] = keys
+        return keys[0]
+
+    async def put_object(self, key: str, body: bytes) -> None:
+        # e.g. a key from a previous process, replayed from the spill store
+        keys = self._keys.pop(key, None) or [key] * len(self.sinks)
+
+        for uploads, store, sink_key in zip(self.uploads, self.spills, keys):
+            if not uploads.queue.full():
+                # does not wait, as there is room in the queue
+                await uploads.submit(sink_key, body)
+
+            elif store:
+                logger.warning("Spilling upload to slow backend %s", uploads.backend)
+                await store.spill(sink_key, body)
+
+            else:
+                logger.warning("Skipping upload to slow backend %s", uploads.backend)
+                metrics.uploads_failed.inc(backend=uploads.backend)
+
+    async def ready(self) -> bool:
+        # The sinks that are not ready fail their uploads on their own
+        results = await asyncio.gather(*(sink.ready() for sink in self.sinks))
+        return any(results)
+
+    async def warm_up(self) -> None:
+        """
+        Warm up the sinks, and start replaying their spilled blobs.
+        """
+        if not self._replay_tasks:
+            loop = asyncio.get_running_loop()
+
+            self._replay_tasks = [
+                loop.create_task(store.run(sink))
+                for sink, store in zip(self.sinks, self.spills)
+                if store
+            ]
+
+        results = await asyncio.gather(
+            *(sink.warm_up() for sink in self.sinks), return_exceptions=True
+        )
+
+        for uploads, result in zip(self.uploads, results):
+            if isinstance(result, Exception):
+                logger.error(
+                    "Failed to warm up backend %s",
+                    uploads.backend,
+                    exc_info=result,
+                )
+
+    async def drain(self, timeout: float | None = None) -> bool:
+        """
+        Wait for the uploads to all the sinks to complete, then stop replaying
+        their spilled blobs. Return whether they did within the timeout.
+        """
+        completed = await asyncio.gather(
+            *(uploads.drain(timeout) for uploads in self.uploads)
+        )
+
+        for task in self._replay_tasks:
+            task.cancel()
+
+        await asyncio.gather(*self._replay_tasks, return_exceptions=True)
+        self._replay_tasks = []
+
+        return all(completed)
@@ -0,0 +1,128 @@
+import random
+import time
+
+from .utils import boolean, get_env, positive_float
+
+
+class FlushScheduler:
+    """
+    Decides when the events writer flushes its buffer.
+
+    By default, the buffer is flushed every `max_delay` seconds, and whenever
+    it holds `batch_size` events.
+
+    When `adaptive`, the arrival rate of the events is estimated, and:
+    - the size that triggers a flush grows with the rate, so that a busy
+      worker flushes at most about every `min_interval` seconds, up to
+      `max_events`, but never below `batch_size`;
+    - the timer fires when the buffer is expected to reach that size, or
+      `max_delay` seconds after its first event, whichever comes first, so
+      quiet workers do not upload near-empty objects on every tick.
+
+    Either way, timer delays are shortened by a random fraction of up to
+    `jitter`, so that workers started together do not upload in lockstep.
+    Delays are only ever shortened, so `max_delay` still holds.
+
+    Delays are never shorter than `min_delay`, and once the oldest event is
+    older than `max_delay`, e.g. as the last flush left the events behind
+    because the backend is not ready, the timer waits `min_interval` seconds
+    between flushes, so that it never turns into a busy loop.
+    """
+
+    # seconds over which arrivals are counted to update the rate
+    rate_window = 1.0
+
+    # weight of the latest window in the rate estimate
+    smoothing = 0.3
+
+    # shortest delay of the timer, in seconds
+    min_delay = 0.1
+
+    def __init__(
+        self,
+        batch_size: int,
+        max_delay: float,
+        max_events: int,
+        adaptive: bool = False,
+        min_interval: float = 1,
+        jitter: float = 0.1,
+        clock=time.monotonic,
+    ):
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.max_events = max(batch_size, max_events)
+
+        self.adaptive = bool(get_env("AFLO_ADAPTIVE_FLUSH", adaptive, validate=boolean))
+        self.min_interval = float(
+            get_env("AFLO_MIN_FLUSH_INTERVAL", min_interval, validate=positive_float)
+        )
+        self.jitter = min(
+            1.0, float(get_env("AFLO_FLUSH_JITTER", jitter, validate=positive_float))
+        )
+
+        self.clock = clock
+
+        # events per second, once estimated
+        self.rate: float | None = None
+        self._window_start = clock()
+        self._window_count = 0
+
+    def observe(self, count: int) -> None:
+        """
+        Record the arrival of `count` events.
+        """
+        now = self.clock()
+        self._window_count += count
+
+        elapsed = now - self._window_start
+        if elapsed < self.rate_window:
+            return
+
+        rate = self._window_count / elapsed
+
+        if self.rate is None:
+            self.rate = rate
+        else:
+            self.rate = self.smoothing * rate + (1 - self.smoothing) * self.rate
+
+        self._window_start = now
+        self._window_count = 0
+
+    @property
+    def target_events(self) -> int:
+        """
+        Number of buffered events that triggers a flush.
+        """
+        if not self.adaptive or not self.rate:
+            return self.batch_size
+
+        target = int(self.rate * self.min_interval)
+
+        return min(max(target, self.batch_size), self.max_events)
+
+    def next_delay(self, buffered: int, age: float) -> float:
+        """
+        Seconds until the next timed flush, given the number of buffered
+        events and the age of the oldest one.
+        """
+        if not self.adaptive:
+            return self._jittered(self.max_delay)
+
+        remaining = self.max_delay - age
+
+        if not buffered or remaining <= 0:
+            # Check again soon, to follow the age of the first event, or to
+            # retry the flush of overdue events
+            return max(self.min_interval, self.min_delay)
+
+        delay = remaining
+
+        if self.rate:
+            to_target = max(0.0, (self.target_events - buffered) / self.rate)
+            delay = min(max(to_target, self.min_interval), remaining)
+
+        return self._jittered(delay)
+
+    def _jittered(self, delay: float) -> float:
+        delay *= 1 - random.uniform(0, self.jitter)
+        return max(delay, self.min_delay)
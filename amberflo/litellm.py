@@ -3,9 +3,12 @@ Instance of the LiteLLM callback.
 """
 
 from .callback import Callback
+from .metrics import start_exporter
 from .writer_factory import build_writer
 
 
 _writer = build_writer()
 
+_exporter = start_exporter()
+
 callback = Callback(_writer)
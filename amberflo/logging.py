@@ -1,8 +1,13 @@
+import atexit
+import copy
 import json
 import logging
+import queue
+import time
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
 
-from .utils import boolean, get_env
+from .utils import boolean, get_env, positive_float
 
 
 aflo_debug = get_env("AFLO_DEBUG", False, validate=boolean)
@@ -11,11 +16,32 @@ _level = logging.DEBUG if aflo_debug else logging.INFO
 
 _json_logs = get_env("AFLO_JSON_LOGS", True, validate=boolean)
 
+# Write the logs from a background thread, instead of the event loop
+_async_logs = get_env("AFLO_ASYNC_LOGS", True, validate=boolean)
 
-def get_logger(name, level=_level, json_logs=_json_logs):
+_warning_interval = float(
+    get_env("AFLO_LOG_WARNING_INTERVAL", 10, validate=positive_float)
+)
+
+
+def get_logger(name, level=_level, json_logs=_json_logs, async_logs=_async_logs):
+    """
+    Returns the named logger, set up to write to stderr.
+
+    Calling it again for the same name replaces the set up instead of adding
+    to it.
+    """
     logger = logging.getLogger(name)
     logger.setLevel(level)
-    logger.addHandler(_get_handler(json_logs))
+
+    for handler in [h for h in logger.handlers if getattr(h, "aflo", False)]:
+        logger.removeHandler(handler)
+
+    for f in [f for f in logger.filters if isinstance(f, RateLimitFilter)]:
+        logger.removeFilter(f)
+
+    logger.addHandler(_get_handler(bool(json_logs), bool(async_logs)))
+    logger.addFilter(RateLimitFilter(_warning_interval))
     logger.propagate = False  # Prevent double logging
     return logger
 
@@ -32,10 +58,97 @@ class JsonFormatter(logging.Formatter):
         if record.exc_info:
             log_obj["exception"] = self.formatException(record.exc_info)
 
+        elif record.exc_text:
+            log_obj["exception"] = record.exc_text
+
         return json.dumps(log_obj, ensure_ascii=False)
 
 
-def _get_handler(json_logs):
+class RateLimitFilter(logging.Filter):
+    """
+    Lets through at most one warning with the same message template every
+    `interval` seconds, and counts the others, so that a condition that
+    repeats on every request (e.g. a full buffer) does not flood the logs.
+
+    Messages are told apart by their template, so repeated warnings must use
+    %-style arguments rather than f-strings. At most `max_templates` are kept
+    track of, the least recently seen being forgotten first.
+    """
+
+    def __init__(
+        self, interval: float = 10, clock=time.monotonic, max_templates: int = 1000
+    ) -> None:
+        super().__init__()
+        self.interval = interval
+        self.clock = clock
+        self.max_templates = max_templates
+        # per template, least recently seen first: time it was last let
+        # through, messages suppressed
+        self._seen: dict[str, tuple[float, int]] = {}
+
+    def filter(self, record) -> bool:
+        if record.levelno != logging.WARNING or not self.interval:
+            return True
+
+        now = self.clock()
+        key = str(record.msg)
+
+        last, suppressed = self._seen.pop(key, (None, 0))
+
+        if last is not None and now - last < self.interval:
+            self._seen[key] = (last, suppressed + 1)
+            return False
+
+        if len(self._seen) >= self.max_templates:
+            del self._seen[next(iter(self._seen))]
+
+        self._seen[key] = (now, 0)
+
+        if suppressed:
+            record.msg = f"{record.msg} ({suppressed} similar messages suppressed)"
+
+        return True
+
+
+class _QueueHandler(QueueHandler):
+    """
+    Hands the records to the listener thread, formatting only what cannot
+    wait: the arguments may change, and the traceback is gone afterwards.
+
+    Unlike `QueueHandler`, it keeps the traceback apart from the message, for
+    the formatter of the listener.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+
+        if record.exc_info:
+            record.exc_text = _plain_formatter.formatException(record.exc_info)
+            record.exc_info = None
+
+        return record
+
+
+_plain_formatter = logging.Formatter()
+
+# shared by all the loggers, per options
+_handlers: dict[tuple[bool, bool], logging.Handler] = {}
+
+
+def _get_handler(json_logs: bool, async_logs: bool) -> logging.Handler:
+    handler = _handlers.get((json_logs, async_logs))
+
+    if handler is None:
+        handler = _handlers[(json_logs, async_logs)] = _make_handler(
+            json_logs, async_logs
+        )
+
+    return handler
+
+
+def _make_handler(json_logs, async_logs):
     handler = logging.StreamHandler()
 
     if json_logs:
@@ -47,4 +160,17 @@ def _get_handler(json_logs):
         )
 
     handler.setFormatter(formatter)
+
+    if async_logs:
+        records = queue.SimpleQueue()
+
+        listener = QueueListener(records, handler)
+        listener.start()
+
+        # Write out the remaining records before exiting
+        atexit.register(listener.stop)
+
+        handler = _QueueHandler(records)
+
+    setattr(handler, "aflo", True)
     return handler
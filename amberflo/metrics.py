@@ -0,0 +1,331 @@
+"""
+Metrics of the pipeline, kept in memory and published by an exporter.
+
+The metrics are updated from the event loop, and read by the exporter, which
+may run in another thread.
+"""
+
+import threading
+from bisect import bisect_left
+from collections.abc import Callable
+from typing import TYPE_CHECKING, Protocol
+
+from .utils import get_env, positive_int
+from .logging import get_logger
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+
+logger = get_logger(__name__)
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, help: str) -> None:
+        self.name = name
+        self.help = help
+        self._values: dict[tuple, float] = {}
+
+    @staticmethod
+    def _key(labels: dict) -> tuple:
+        return tuple(sorted(labels.items()))
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> list[tuple[str, tuple, float]]:
+        """
+        Returns the name, labels and value of each sample.
+        """
+        return [(self.name, key, value) for key, value in list(self._values.items())]
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    """
+    Counts observations in buckets, whose upper bounds are `buckets`.
+    """
+
+    type = "histogram"
+
+    default_buckets = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    def __init__(self, name: str, help: str, buckets=default_buckets) -> None:
+        super().__init__(name, help)
+        self.buckets = tuple(sorted(buckets))
+        # per labels: count per bucket (the last one being +Inf), sum
+        self._states: dict[tuple, tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+
+        state = self._states.get(key)
+        if state is None:
+            state = self._states[key] = ([0] * (len(self.buckets) + 1), [0.0])
+
+        counts, total = state
+        counts[bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def count(self, **labels) -> int:
+        state = self._states.get(self._key(labels))
+        return sum(state[0]) if state else 0
+
+    def sum(self, **labels) -> float:
+        state = self._states.get(self._key(labels))
+        return state[1][0] if state else 0.0
+
+    def samples(self) -> list[tuple[str, tuple, float]]:
+        samples = []
+
+        for key, (counts, total) in list(self._states.items()):
+            cumulative = 0
+            bounds = [str(float(b)) for b in self.buckets] + ["+Inf"]
+
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                samples.append(
+                    (f"{self.name}_bucket", key + (("le", bound),), cumulative)
+                )
+
+            samples.append((f"{self.name}_sum", key, total[0]))
+            samples.append((f"{self.name}_count", key, cumulative))
+
+        return samples
+
+
+class Registry:
+    """
+    Keeps the metrics by name.
+    """
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, Metric] = {}
+        self._collectors: list[Callable[[], None]] = []
+
+    def counter(self, name: str, help: str) -> Counter:
+        return self._get(Counter, name, help)
+
+    def gauge(self, name: str, help: str) -> Gauge:
+        return self._get(Gauge, name, help)
+
+    def histogram(self, name: str, help: str, **kwargs) -> Histogram:
+        return self._get(Histogram, name, help, **kwargs)
+
+    def _get(self, cls, name, help, **kwargs):
+        metric = self._metrics.get(name)
+
+        if metric is None:
+            metric = self._metrics[name] = cls(name, help, **kwargs)
+
+        elif not isinstance(metric, cls):
+            raise ValueError(f"Metric {name} is already registered as a {metric.type}")
+
+        return metric
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """
+        Registers a function that updates metrics kept elsewhere, e.g. in a
+        cache, before they are collected.
+        """
+        self._collectors.append(collector)
+
+    def collect(self) -> list[Metric]:
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception:
+                logger.exception("Failed to update metrics")
+
+        return list(self._metrics.values())
+
+
+def render_prometheus(registry: Registry) -> str:
+    """
+    Formats the metrics in the Prometheus text exposition format.
+    """
+    lines = []
+
+    for metric in registry.collect():
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+
+        for name, labels, value in metric.samples():
+            if labels:
+                pairs = ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels)
+                name = f"{name}{{{pairs}}}"
+
+            lines.append(f"{name} {value}")
+
+    return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Exporter(Protocol):
+    """
+    Publishes the metrics of a registry.
+    """
+
+    def start(self, registry: Registry) -> None: ...
+
+    def close(self) -> None: ...
+
+
+class PrometheusExporter:
+    """
+    Serves the metrics in the Prometheus text format, over HTTP on `port`,
+    from a background thread.
+    """
+
+    def __init__(self, port=9464, host="0.0.0.0"):
+        self.port = int(get_env("AFLO_METRICS_PORT", port, validate=positive_int))
+        self.host = str(get_env("AFLO_METRICS_HOST", host))
+        self.server: "ThreadingHTTPServer | None" = None
+
+    def start(self, registry: Registry) -> None:
+        # Imported here, as most workers never serve the metrics
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = render_prometheus(registry).encode()
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.port = self.server.server_address[1]
+
+        thread = threading.Thread(
+            target=self.server.serve_forever, name="aflo-metrics", daemon=True
+        )
+        thread.start()
+
+        logger.info(f"Serving metrics on: {self.host}:{self.port}")
+
+    def close(self) -> None:
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+_exporters = {"prometheus": PrometheusExporter}
+
+
+def start_exporter(exporter: Exporter | None = None) -> Exporter | None:
+    """
+    Starts the given exporter, or else the one chosen by the environment, if
+    any, and returns it.
+    """
+    if exporter is None:
+        name = str(get_env("AFLO_METRICS_EXPORTER", "none")).lower()
+
+        if name == "none":
+            return None
+
+        if name not in _exporters:
+            raise ValueError(f"Unsupported AFLO_METRICS_EXPORTER: {name}")
+
+        exporter = _exporters[name]()
+
+    try:
+        exporter.start(registry)
+        return exporter
+
+    except OSError:
+        # e.g. another worker already serves the metrics on the same port
+        logger.exception("Failed to start metrics exporter")
+        return None
+
+
+registry = Registry()
+
+duplicates_dropped = registry.counter(
+    "aflo_duplicates_dropped_total", "Logs dropped as duplicates of a previous one"
+)
+events_received = registry.counter(
+    "aflo_events_received_total", "Events handed to the writer"
+)
+events_dropped = registry.counter(
+    "aflo_events_dropped_total", "Events dropped, by reason"
+)
+events_flushed = registry.counter(
+    "aflo_events_flushed_total", "Events extracted from the buffer to be uploaded"
+)
+buffer_events = registry.gauge("aflo_buffer_events", "Events in the buffer")
+flush_seconds = registry.histogram(
+    "aflo_flush_duration_seconds", "Duration of the flushes of the buffer"
+)
+encode_seconds = registry.histogram(
+    "aflo_encode_duration_seconds",
+    "Duration of the serialization and compression of a batch, by serializer",
+)
+compression_ratio = registry.gauge(
+    "aflo_compression_ratio", "Compressed size over serialized size of the batches"
+)
+upload_seconds = registry.histogram(
+    "aflo_upload_duration_seconds", "Duration of the uploads, by backend"
+)
+uploads_failed = registry.counter(
+    "aflo_uploads_failed_total", "Uploads that failed after retries, by backend"
+)
+upload_retries = registry.counter(
+    "aflo_upload_retries_total", "Retried upload requests, by backend"
+)
+uploads_in_flight = registry.gauge(
+    "aflo_uploads_in_flight", "Uploads running, by backend"
+)
+uploads_pending = registry.gauge(
+    "aflo_uploads_pending", "Uploads waiting for a free slot, by backend"
+)
+loop_lag_seconds = registry.histogram(
+    "aflo_event_loop_lag_seconds", "How late the event loop runs timers"
+)
+stage_seconds = registry.histogram(
+    "aflo_stage_duration_seconds", "Wall time of the stages of the pipeline"
+)
+transformer_cache_hits = registry.counter(
+    "aflo_transformer_cache_hits_total", "Hits of the transformer caches, by cache"
+)
+transformer_cache_misses = registry.counter(
+    "aflo_transformer_cache_misses_total", "Misses of the transformer caches, by cache"
+)
+transformer_cache_size = registry.gauge(
+    "aflo_transformer_cache_size", "Entries in the transformer caches, by cache"
+)
+stage_cpu_seconds = registry.counter(
+    "aflo_stage_cpu_seconds_total", "CPU time of the stages of the pipeline"
+)
@@ -0,0 +1,101 @@
+"""
+Hooks to find out when the work done on the event loop starts to hurt the
+latency of the requests:
+- `timed` records the wall and CPU time of a synchronous stage of the
+  pipeline, and warns about slow calls;
+- `LoopLagMonitor` samples how late the event loop runs timers, and warns
+  when it lags.
+
+The CPU time is the one of the thread. Coroutines cannot be timed, since it
+would include the other tasks that run while they wait: time the synchronous
+parts of their work instead.
+"""
+
+import asyncio
+import functools
+import inspect
+import time
+
+from . import metrics
+from .utils import boolean, get_env, positive_float
+from .logging import get_logger
+
+
+logger = get_logger(__name__)
+
+_profile_stages = bool(get_env("AFLO_PROFILE_STAGES", False, validate=boolean))
+
+_slow_stage_threshold = float(
+    get_env("AFLO_SLOW_STAGE_THRESHOLD", 0.1, validate=positive_float)
+)
+
+
+def timed(stage: str, enabled=_profile_stages, threshold=_slow_stage_threshold):
+    """
+    Decorator that records the duration of each call of a function as the
+    given stage, and warns when it takes more than `threshold` seconds.
+
+    When not enabled, the function is returned as is, at no cost.
+    """
+
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            raise TypeError(f"Cannot time coroutine function: {fn.__qualname__}")
+
+        if not enabled:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            wall, cpu = time.perf_counter(), time.thread_time()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _record(stage, wall, cpu, threshold)
+
+        return wrapper
+
+    return decorator
+
+
+def _record(stage: str, wall_start: float, cpu_start: float, threshold: float):
+    wall = time.perf_counter() - wall_start
+    cpu = time.thread_time() - cpu_start
+
+    metrics.stage_seconds.observe(wall, stage=stage)
+    metrics.stage_cpu_seconds.inc(cpu, stage=stage)
+
+    if threshold and wall >= threshold:
+        logger.warning(
+            "Slow stage %s: %.1f ms (cpu: %.1f ms)", stage, wall * 1000, cpu * 1000
+        )
+
+
+class LoopLagMonitor:
+    """
+    Checks every `interval` seconds how late the event loop wakes up a
+    sleeping task, and warns when it is more than `threshold` seconds late.
+
+    An `interval` of zero disables the monitor.
+    """
+
+    def __init__(self, interval: float = 0, threshold: float = 0.1):
+        self.interval = float(
+            get_env("AFLO_LOOP_LAG_INTERVAL", interval, validate=positive_float)
+        )
+        self.threshold = float(
+            get_env("AFLO_LOOP_LAG_THRESHOLD", threshold, validate=positive_float)
+        )
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+
+            lag = max(0.0, loop.time() - expected)
+            metrics.loop_lag_seconds.observe(lag)
+
+            if self.threshold and lag >= self.threshold:
+                logger.warning("Event loop lagging: %.1f ms", lag * 1000)
@@ -1,12 +1,14 @@
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from functools import partial
 from datetime import datetime
 
 import boto3
 from botocore.client import Config
 
+from . import metrics
 from .blob_client import BlobWriter
-from .utils import get_env, make_key
+from .utils import get_env, make_key, positive_int
 from .logging import get_logger
 
 
@@ -16,6 +18,10 @@ logger = get_logger(__name__)
 class S3Client(BlobWriter):
     """
     Wrapper around the AWS S3 client.
+
+    Uploads run in a dedicated thread pool, sized together with the client's
+    connection pool, so that they neither compete with LiteLLM for the
+    default executor nor wait for a connection.
     """
 
     def __init__(
@@ -25,11 +31,25 @@ class S3Client(BlobWriter):
         region_name=None,
         bucket=None,
         path=None,
+        endpoint_url=None,
+        max_connections=10,
     ):
         self.region_name = get_env("AWS_REGION", region_name, required=True)
         self.bucket = get_env("AFLO_BUCKET_NAME", bucket, required=True)
         self.path = get_env("AFLO_PATH", path)
 
+        # e.g. a local S3 stand-in, for testing
+        self.endpoint_url = get_env("AFLO_S3_ENDPOINT_URL", endpoint_url)
+
+        self.max_connections = max(
+            1,
+            int(
+                get_env(
+                    "AFLO_S3_MAX_CONNECTIONS", max_connections, validate=positive_int
+                )
+            ),
+        )
+
         session = boto3.Session(
             aws_access_key_id=get_env("AWS_ACCESS_KEY_ID", aws_access_key_id),
             aws_secret_access_key=get_env(
@@ -39,11 +59,24 @@ class S3Client(BlobWriter):
         )
 
         self.s3 = session.client(
-            "s3", config=Config(retries={"max_attempts": 5, "mode": "standard"})
+            "s3",
+            endpoint_url=self.endpoint_url,
+            config=Config(
+                retries={"max_attempts": 5, "mode": "standard"},
+                max_pool_connections=self.max_connections,
+                tcp_keepalive=True,
+            ),
+        )
+
+        self.executor = ThreadPoolExecutor(
+            self.max_connections, thread_name_prefix="aflo-s3"
         )
 
         logger.debug(
-            "Initialized S3 client: bucket: '%s', path: '%s'", self.bucket, self.path
+            "Initialized S3 client: bucket: '%s', path: '%s', max_connections: %s",
+            self.bucket,
+            self.path,
+            self.max_connections,
         )
 
     async def put_object(self, key: str, body: bytes) -> None:
@@ -52,8 +85,8 @@ class S3Client(BlobWriter):
         # boto3 is not async and we don't want to block the event loop, so we
         # run the upload in a separate thread.
         loop = asyncio.get_running_loop()
-        await loop.run_in_executor(
-            None,
+        response = await loop.run_in_executor(
+            self.executor,
             partial(
                 self.s3.put_object,
                 Bucket=self.bucket,
@@ -64,6 +97,11 @@ class S3Client(BlobWriter):
             ),
         )
 
+        # botocore retries on its own, and only reports how many times
+        retries = response.get("ResponseMetadata", {}).get("RetryAttempts", 0)
+        if retries:
+            metrics.upload_retries.inc(retries, backend="S3Client")
+
         logger.debug(f"Wrote to S3 bucket {self.bucket}: {key}")
 
     def make_key(self, timestamp: datetime) -> str:
@@ -0,0 +1,261 @@
+"""
+Local uploader sidecar, shared by the workers of a host.
+
+Each worker forwards its events over a Unix domain socket, as lines of JSON
+arrays of events, to a single process that owns the buffer, compression and
+backend clients. This results in fewer, larger objects, and takes the upload
+work out of the processes serving requests.
+
+Run the sidecar with:
+
+    python -m amberflo.sidecar
+
+Both the sidecar and the workers use `AFLO_SIDECAR_SOCKET` as the path of the
+socket. The sidecar is configured by the rest of the environment variables,
+just like an in-process writer.
+"""
+
+import asyncio
+import json
+import os
+import signal
+
+from . import metrics
+from .event_record import to_json_default
+from .events_writer import AsyncEventsWriter
+from .utils import get_env, positive_int
+from .logging import get_logger
+
+
+logger = get_logger(__name__)
+
+# maximum size of a line, i.e. of the events sent at once
+_max_line_bytes = 16 * 1024 * 1024
+
+# seconds to wait before reconnecting to the sidecar
+_retry_delay = 1
+
+
+class SidecarEventsWriter:
+    """
+    Writer used by the workers, which forwards the events to the sidecar.
+
+    Writes never wait: the events are kept in memory, up to `max_pending` (no
+    limit if zero), and a background task sends them in lines of up to
+    `batch_size` events. If the sidecar is not reachable, the events are kept
+    until it is.
+    """
+
+    # see `Callback`
+    writes_nowait = True
+
+    def __init__(self, path=None, max_pending=10000, batch_size=1000):
+        self.path = str(get_env("AFLO_SIDECAR_SOCKET", path, required=True))
+        self.max_pending = int(
+            get_env("AFLO_SIDECAR_MAX_PENDING", max_pending, validate=positive_int)
+        )
+        self.batch_size = batch_size
+
+        self._pending: list[dict] = []
+        self._events_pending: asyncio.Event | None = None
+        self._stream: asyncio.StreamWriter | None = None
+        self.send_task: asyncio.Task | None = None
+
+        logger.debug(
+            "Sidecar events writer initialized: path: %s, max_pending: %s",
+            self.path,
+            self.max_pending,
+        )
+
+    @property
+    def events_pending(self) -> asyncio.Event:
+        """
+        Lazy initialization of asyncio.Event to avoid event loop issues.
+        """
+        if self._events_pending is None:
+            self._events_pending = asyncio.Event()
+        return self._events_pending
+
+    async def async_write(self, events) -> None:
+        self.write_nowait(events)
+
+    def write_nowait(self, events) -> None:
+        """
+        Adds the events to the ones pending to be sent to the sidecar, or drops
+        them if there are too many already.
+        """
+        if self.send_task is None:
+            self.send_task = asyncio.get_running_loop().create_task(
+                self._send_pending()
+            )
+
+        if self.max_pending and len(self._pending) + len(events) > self.max_pending:
+            logger.warning(
+                "Dropping %s events due to sidecar queue being full (capacity: %s)",
+                len(events),
+                self.max_pending,
+            )
+            metrics.events_dropped.inc(len(events), reason="sidecar_full")
+            return
+
+        self._pending.extend(events)
+        self.events_pending.set()
+
+    async def _send_pending(self) -> None:
+        """
+        Background task that sends the pending events, reconnecting as needed.
+        """
+        while True:
+            await self.events_pending.wait()
+            self.events_pending.clear()
+
+            try:
+                await self._send()
+
+            except Exception as e:
+                if isinstance(e, OSError):
+                    # e.g. the sidecar is restarting, no need for a traceback
+                    logger.warning("Failed to send events to sidecar: %s", e)
+                else:
+                    logger.exception("Failed to send events to sidecar: %s", self.path)
+
+                self._disconnect()
+                await asyncio.sleep(_retry_delay)
+
+                # Retry whatever was not sent
+                self.events_pending.set()
+
+    async def _send(self) -> None:
+        while self._pending:
+            if self._stream is None:
+                _, self._stream = await asyncio.open_unix_connection(self.path)
+
+            events = self._pending[: self.batch_size]
+
+            line = json.dumps(events, default=to_json_default).encode() + b"\n"
+            self._stream.write(line)
+            await self._stream.drain()
+
+            # New events are only appended, so these are still the first ones
+            del self._pending[: len(events)]
+
+    def _disconnect(self) -> None:
+        if self._stream:
+            self._stream.close()
+            self._stream = None
+
+    async def shutdown(self, timeout: float | None = 30) -> bool:
+        """
+        Send the pending events. Return whether they were within the timeout.
+        """
+        if self.send_task:
+            self.send_task.cancel()
+            await asyncio.gather(self.send_task, return_exceptions=True)
+            self.send_task = None
+
+        try:
+            await asyncio.wait_for(self._send(), timeout)
+
+        except Exception:
+            logger.exception(
+                "Failed to send %s events to sidecar: %s", len(self._pending), self.path
+            )
+
+        self._disconnect()
+
+        return not self._pending
+
+
+class SidecarServer:
+    """
+    Receives the events from the workers, and writes them with `writer`.
+    """
+
+    def __init__(self, writer: AsyncEventsWriter, path=None):
+        self.writer = writer
+        self.path = str(get_env("AFLO_SIDECAR_SOCKET", path, required=True))
+        self._server: asyncio.Server | None = None
+        self._connections: set[asyncio.StreamWriter] = set()
+
+    async def start(self) -> None:
+        # Remove the socket left behind by a previous run
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+        self._server = await asyncio.start_unix_server(
+            self._handle, self.path, limit=_max_line_bytes
+        )
+
+        await self.writer.async_init()
+
+        logger.info(f"Sidecar listening on: {self.path}")
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, stream: asyncio.StreamWriter
+    ) -> None:
+        self._connections.add(stream)
+
+        try:
+            while line := await reader.readline():
+                try:
+                    events = json.loads(line)
+                except ValueError:
+                    logger.warning("Ignoring malformed events from worker")
+                    continue
+
+                await self.writer.async_write(events)
+
+        except Exception:
+            logger.exception("Error reading events from worker")
+
+        finally:
+            self._connections.discard(stream)
+            stream.close()
+
+    async def stop(self, timeout: float | None = 30) -> bool:
+        """
+        Stop accepting events, then flush and drain the writer.
+        """
+        if self._server:
+            self._server.close()
+            self._server = None
+
+        # The workers keep their connections open, so close them here
+        for stream in list(self._connections):
+            stream.close()
+
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+        return await self.writer.shutdown(timeout)
+
+
+async def serve() -> None:
+    """
+    Run the sidecar until interrupted.
+    """
+    from .writer_factory import build_backend_writer
+
+    server = SidecarServer(build_backend_writer())
+    await server.start()
+
+    exporter = metrics.start_exporter()
+
+    stop = asyncio.Event()
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await stop.wait()
+
+    logger.info("Sidecar stopping")
+
+    await server.stop()
+
+    if exporter:
+        exporter.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(serve())
@@ -0,0 +1,241 @@
+import asyncio
+import os
+import pathlib
+import time
+import uuid
+
+from .blob_client import BlobWriter
+from .utils import get_env, positive_int
+from .logging import get_logger
+
+
+logger = get_logger(__name__)
+
+
+class SpillStore:
+    """
+    Durable local storage for batches that could not be delivered, either
+    because the buffer was full or because the upload failed.
+
+    Each batch is written atomically to its own segment file, holding the key
+    on the first line followed by the compressed body. Segments are replayed
+    in order, with bounded concurrency, and deleted once uploaded. Segments
+    left over by a previous process are replayed on startup.
+
+    The directory may be shared by several workers: a segment is claimed,
+    by renaming it, before it is replayed, so that only one of them uploads
+    it. Claims and partially written segments older than `stale_after`
+    seconds are left over by a crashed process, and are recovered.
+    """
+
+    stale_after = 600
+
+    def __init__(
+        self,
+        directory=None,
+        max_bytes=1024 * 1024 * 1024,
+        replay_interval=30,
+        replay_concurrency=2,
+        subdirectory: str | None = None,
+    ):
+        self.directory = pathlib.Path(
+            str(get_env("AFLO_SPILL_DIR", directory, required=True))
+        )
+
+        # e.g. to keep the batches of each backend apart
+        if subdirectory:
+            self.directory = self.directory / subdirectory
+        self.max_bytes = int(
+            get_env("AFLO_SPILL_MAX_BYTES", max_bytes, validate=positive_int)
+        )
+        self.replay_interval = int(
+            get_env(
+                "AFLO_SPILL_REPLAY_INTERVAL", replay_interval, validate=positive_int
+            )
+        )
+        self.replay_concurrency = max(
+            1,
+            int(
+                get_env(
+                    "AFLO_SPILL_REPLAY_CONCURRENCY",
+                    replay_concurrency,
+                    validate=positive_int,
+                )
+            ),
+        )
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        logger.debug(
+            "Spill store initialized: directory: '%s', max_bytes: %s",
+            self.directory,
+            self.max_bytes,
+        )
+
+    def segments(self) -> list[pathlib.Path]:
+        """
+        Return the segment files, oldest first.
+        """
+        return sorted(self.directory.glob("*.seg"))
+
+    def size(self) -> int:
+        size = 0
+
+        for path in self.directory.glob("*.seg"):
+            size += _size(path)
+
+        for path in self.directory.glob("*.replaying"):
+            size += _size(path)
+
+        return size
+
+    def recover(self) -> None:
+        """
+        Release the stale claims and delete the stale partial segments. Blocking.
+        """
+        now = time.time()
+
+        for path in self.directory.glob("*.replaying"):
+            if _is_stale(path, now, self.stale_after):
+                logger.warning("Recovering stale spilled batch: %s", path.name)
+                _rename(path, path.with_suffix(".seg"))
+
+        for path in self.directory.glob("*.tmp"):
+            if _is_stale(path, now, self.stale_after):
+                logger.warning("Deleting partial spilled batch: %s", path.name)
+                path.unlink(missing_ok=True)
+
+    def save(self, key: str, body: bytes) -> pathlib.Path | None:
+        """
+        Write a batch to a new segment file. Blocking.
+        """
+        if self.size() + len(body) > self.max_bytes:
+            logger.error(
+                "Dropping batch due to spill store being full (capacity: %s): %s",
+                self.max_bytes,
+                key,
+            )
+            return None
+
+        name = f"{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+        tmp_path = self.directory / f"{name}.tmp"
+        path = self.directory / f"{name}.seg"
+
+        with open(tmp_path, "wb") as f:
+            f.write(key.encode() + b"\n")
+            f.write(body)
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(tmp_path, path)
+
+        logger.warning("Spilled batch to disk: %s: %s", key, path.name)
+
+        return path
+
+    async def spill(self, key: str, body: bytes) -> None:
+        """
+        Write a batch to a new segment file, without blocking the event loop.
+        """
+        try:
+            await asyncio.to_thread(self.save, key, body)
+        except Exception:
+            logger.exception("Failed to spill batch: %s", key)
+
+    async def replay(self, client: BlobWriter) -> int:
+        """
+        Upload the spilled batches, deleting them once uploaded. Stop at the
+        first failure, as the backend is likely still unavailable. Return the
+        number of batches uploaded.
+        """
+        segments = self.segments()
+        if not segments:
+            return 0
+
+        logger.info("Replaying %s spilled batches", len(segments))
+
+        semaphore = asyncio.Semaphore(self.replay_concurrency)
+        failed = asyncio.Event()
+
+        async def replay_segment(path: pathlib.Path) -> bool:
+            async with semaphore:
+                if failed.is_set():
+                    return False
+
+                claimed = path.with_suffix(".replaying")
+
+                # Skip the segments claimed by another worker
+                if not await asyncio.to_thread(_claim, path, claimed):
+                    return False
+
+                try:
+                    data = await asyncio.to_thread(claimed.read_bytes)
+                    key, body = data.split(b"\n", 1)
+
+                    await client.put_object(key.decode(), body)
+
+                    await asyncio.to_thread(claimed.unlink, True)
+                    return True
+
+                except Exception:
+                    logger.exception("Failed to replay spilled batch: %s", path.name)
+                    failed.set()
+
+                    await asyncio.to_thread(_rename, claimed, path)
+                    return False
+
+        results = await asyncio.gather(*(replay_segment(p) for p in segments))
+
+        replayed = sum(results)
+        logger.info("Replayed %s of %s spilled batches", replayed, len(segments))
+
+        return replayed
+
+    async def run(self, client: BlobWriter) -> None:
+        """
+        Background task for replaying spilled batches periodically, starting
+        with the ones left over by a previous process.
+        """
+        while True:
+            try:
+                await asyncio.to_thread(self.recover)
+                await self.replay(client)
+                await asyncio.sleep(self.replay_interval)
+
+            except Exception:
+                logger.exception("Error in spill store replay")
+                await asyncio.sleep(self.replay_interval)
+
+
+def _rename(source: pathlib.Path, target: pathlib.Path) -> bool:
+    """
+    Rename a file, unless another process already renamed or deleted it.
+    """
+    try:
+        os.rename(source, target)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def _claim(path: pathlib.Path, claimed: pathlib.Path) -> bool:
+    if not _rename(path, claimed):
+        return False
+
+    # Dates the claim, which is stale if not released in time
+    os.utime(claimed)
+    return True
+
+
+def _size(path: pathlib.Path) -> int:
+    try:
+        return path.stat().st_size
+    except FileNotFoundError:
+        return 0
+
+
+def _is_stale(path: pathlib.Path, now: float, stale_after: float) -> bool:
+    try:
+        return now - path.stat().st_mtime > stale_after
+    except FileNotFoundError:
+        return False
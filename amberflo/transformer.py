@@ -4,9 +4,11 @@ LiteLLM's Standard Logging Payload objects.
 """
 
 import re
+from functools import lru_cache
 from urllib.parse import urlparse
 
-from .utils import get_env, boolean
+from . import metrics
+from .utils import get_env, boolean, positive_int
 
 
 _unknown = "unknown"
@@ -17,6 +19,10 @@ _hosted_env = get_env("AFLO_HOSTED_ENV", _unknown)
 
 _send_metadata = get_env("AFLO_SEND_OBJECT_METADATA", default=False, validate=boolean)
 
+# The distinct combinations of provider, model and api base are few, so their
+# resolution is cached.
+_cache_size = int(get_env("AFLO_TRANSFORMER_CACHE_SIZE", 1024, validate=positive_int))
+
 
 def extract_events_from_log(log, send_metadata=_send_metadata, hosted_env=_hosted_env):
     metadata = log["metadata"]
@@ -27,7 +33,7 @@ def extract_events_from_log(log, send_metadata=_send_metadata, hosted_env=_hoste
 
     business_unit_id, team = _get_bu_and_team(metadata)
 
-    provider, model = _resolve_provider_model(log)
+    provider, model = _resolve_provider_model(log["custom_llm_provider"], log["model"])
 
     model_info = log["model_map_information"]["model_map_value"]
 
@@ -47,7 +53,7 @@ def extract_events_from_log(log, send_metadata=_send_metadata, hosted_env=_hoste
 
     user = metadata.get("user_api_key_user_id") or _unknown
 
-    region = _resolve_region(platform, log) or _global
+    region = _resolve_region(platform, log["api_base"]) or _global
 
     ## ERRORS
     error_details = _extract_error_details(log["error_information"])
@@ -148,13 +154,81 @@ def extract_events_from_log(log, send_metadata=_send_metadata, hosted_env=_hoste
     return events
 
 
-def _resolve_region(platform, log):
+# Fields of the metadata read by `extract_events_from_log`, except for the
+# nested ones, which are trimmed separately.
+_metadata_fields = (
+    "user_api_key_alias",
+    "user_api_key_user_id",
+    "user_api_key_team_id",
+    "user_api_key_team_alias",
+)
+
+
+def slim_log(log):
+    """
+    Returns a compact copy of the log with only the fields read by
+    `extract_events_from_log`, so that the transformation can be deferred
+    without keeping the whole log alive.
+    """
+    metadata = log["metadata"]
+
+    slim_metadata = {k: metadata[k] for k in _metadata_fields if k in metadata}
+
+    auth_metadata = metadata.get("user_api_key_auth_metadata")
+    if auth_metadata:
+        slim_metadata["user_api_key_auth_metadata"] = {
+            "business_unit_id": auth_metadata.get("business_unit_id")
+        }
+
+    usage = metadata["usage_object"]
+    slim_metadata["usage_object"] = usage and {
+        "prompt_tokens": usage.get("prompt_tokens"),
+        "completion_tokens": usage.get("completion_tokens"),
+    }
+
+    model_info = log["model_map_information"]["model_map_value"]
+    model_parameters = log["model_parameters"]
+
+    return {
+        "id": log["id"],
+        "startTime": log["startTime"],
+        "endTime": log["endTime"],
+        "custom_llm_provider": log["custom_llm_provider"],
+        "model": log["model"],
+        "api_base": log["api_base"],
+        "call_type": log["call_type"],
+        "metadata": slim_metadata,
+        "model_map_information": {
+            "model_map_value": model_info
+            and {
+                "key": model_info["key"],
+                "litellm_provider": model_info["litellm_provider"],
+            }
+        },
+        "hidden_params": {"batch_models": log["hidden_params"]["batch_models"]},
+        "error_information": {
+            k: log["error_information"][k]
+            for k in (
+                "error_class",
+                "error_code",
+                "error_message",
+                "llm_provider",
+                "traceback",
+            )
+        },
+        "model_parameters": model_parameters
+        and ({"n": model_parameters["n"]} if "n" in model_parameters else {}),
+    }
+
+
+@lru_cache(maxsize=_cache_size)
+def _resolve_region(platform, api_base):
     if platform == "bedrock":
-        return _get_api_base_domain_part(log, 1)
+        return _get_api_base_domain_part(api_base, 1)
 
     # TODO test these
     if platform in ("azure", "google"):
-        return _get_api_base_domain_part(log, 0)
+        return _get_api_base_domain_part(api_base, 0)
 
     return None
 
@@ -215,9 +289,7 @@ def _get_object_metadata(metadata):
     return []
 
 
-def _get_api_base_domain_part(log, index):
-    api_base = log["api_base"]
-
+def _get_api_base_domain_part(api_base, index):
     if api_base:
         hostname = urlparse(api_base).hostname
         if hostname:
@@ -227,15 +299,51 @@ def _get_api_base_domain_part(log, index):
     return None
 
 
-def _resolve_provider_model(log):
-    provider, model = log["custom_llm_provider"], log["model"]
-
+@lru_cache(maxsize=_cache_size)
+def _resolve_provider_model(provider, model):
     if provider != "openai" and "." in model:
         provider, model = model.split(".", 1)
 
     return provider, model
 
 
+def cache_stats() -> dict:
+    """
+    Returns the hit and miss counts of the resolution caches, to check that
+    they pay off.
+    """
+    stats = {}
+
+    for name, cached in (
+        ("provider_model", _resolve_provider_model),
+        ("region", _resolve_region),
+    ):
+        info = cached.cache_info()
+        total = info.hits + info.misses
+
+        stats[name] = {
+            "hits": info.hits,
+            "misses": info.misses,
+            "hit_rate": info.hits / total if total else 0.0,
+            "size": info.currsize,
+        }
+
+    return stats
+
+
+def _collect_cache_stats():
+    for name, stats in cache_stats().items():
+        hits = stats["hits"] - metrics.transformer_cache_hits.value(cache=name)
+        misses = stats["misses"] - metrics.transformer_cache_misses.value(cache=name)
+
+        metrics.transformer_cache_hits.inc(hits, cache=name)
+        metrics.transformer_cache_misses.inc(misses, cache=name)
+        metrics.transformer_cache_size.set(stats["size"], cache=name)
+
+
+metrics.registry.add_collector(_collect_cache_stats)
+
+
 def _get_meter_name(unit):
     if unit == "query":
         unit = "queries"
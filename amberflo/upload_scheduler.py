@@ -0,0 +1,140 @@
+import asyncio
+import time
+from collections.abc import Awaitable, Callable
+
+from . import metrics
+from .blob_client import BlobWriter
+from .utils import get_env, positive_int
+from .logging import get_logger
+
+
+logger = get_logger(__name__)
+
+
+class UploadScheduler:
+    """
+    Runs the uploads of blobs in the background, keeping track of them.
+
+    At most `max_in_flight` uploads run at the same time, and at most
+    `max_pending` more wait in a queue. Once the queue is full, submitting
+    waits for room, which holds the flush back and lets the events buffer
+    absorb (or drop) new events, so memory stays bounded when the backend is
+    slow.
+
+    Failed uploads are handed to `on_failure`, if given.
+    """
+
+    def __init__(
+        self,
+        client: BlobWriter,
+        max_in_flight=4,
+        max_pending=16,
+        on_failure: Callable[[str, bytes], Awaitable[None]] | None = None,
+    ):
+        self.client = client
+        self.on_failure = on_failure
+        self.backend = getattr(client, "name", type(client).__name__)
+
+        self.max_in_flight = max(
+            1,
+            int(
+                get_env(
+                    "AFLO_MAX_UPLOADS_IN_FLIGHT", max_in_flight, validate=positive_int
+                )
+            ),
+        )
+        self.max_pending = int(
+            get_env("AFLO_MAX_PENDING_UPLOADS", max_pending, validate=positive_int)
+        )
+
+        # Coordination elements will be lazily initialized to avoid issues with
+        # event loop not being ready
+        self._queue: asyncio.Queue[tuple[str, bytes]] | None = None
+        self._workers: set[asyncio.Task] = set()
+        self._active_workers = 0
+        self.in_flight = 0
+
+        logger.debug(
+            "Upload scheduler initialized: max_in_flight: %s, max_pending: %s",
+            self.max_in_flight,
+            self.max_pending,
+        )
+
+    @property
+    def queue(self) -> asyncio.Queue[tuple[str, bytes]]:
+        """
+        Lazy initialization of asyncio.Queue to avoid event loop issues.
+        """
+        if self._queue is None:
+            self._queue = asyncio.Queue(self.max_pending)
+        return self._queue
+
+    @property
+    def pending(self) -> int:
+        return self.queue.qsize()
+
+    async def submit(self, key: str, body: bytes) -> None:
+        """
+        Schedule the upload of a blob, waiting if too many are pending.
+        """
+        await self.queue.put((key, body))
+        metrics.uploads_pending.set(self.pending, backend=self.backend)
+
+        # Workers are started on demand and exit once the queue is empty
+        if self._active_workers < self.max_in_flight:
+            self._active_workers += 1
+            worker = asyncio.get_running_loop().create_task(self._work())
+            self._workers.add(worker)
+            worker.add_done_callback(self._workers.discard)
+
+    async def drain(self, timeout: float | None = None) -> bool:
+        """
+        Wait for the pending and in flight uploads to complete. Return whether
+        they did within the timeout.
+        """
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+            return True
+
+        except TimeoutError:
+            logger.warning(
+                "Timed out waiting for uploads: pending: %s, in flight: %s",
+                self.pending,
+                self.in_flight,
+            )
+            return False
+
+    async def _work(self) -> None:
+        try:
+            while not self.queue.empty():
+                key, body = self.queue.get_nowait()
+                self.in_flight += 1
+
+                metrics.uploads_pending.set(self.pending, backend=self.backend)
+                metrics.uploads_in_flight.inc(backend=self.backend)
+
+                start = time.perf_counter()
+
+                try:
+                    await self.client.put_object(key, body)
+
+                    metrics.upload_seconds.observe(
+                        time.perf_counter() - start, backend=self.backend
+                    )
+
+                except Exception:
+                    logger.exception("Failed to write: %s", key)
+                    metrics.uploads_failed.inc(backend=self.backend)
+
+                    if self.on_failure:
+                        await self.on_failure(key, body)
+
+                finally:
+                    self.in_flight -= 1
+                    metrics.uploads_in_flight.dec(backend=self.backend)
+                    self.queue.task_done()
+
+        finally:
+            # Not in a done callback, which would run too late to let the next
+            # submit start a new worker.
+            self._active_workers -= 1
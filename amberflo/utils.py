@@ -19,6 +19,18 @@ def positive_int(key, x: str) -> int:
     return y
 
 
+def positive_float(key, x: str) -> float:
+    try:
+        y = float(x)
+    except ValueError:
+        raise ValueError(f"{key} must be a number, got: {x}")
+
+    if y < 0:
+        raise ValueError(f"{key} must be positive, got: {x}")
+
+    return y
+
+
 def get_env(key, default=None, validate=None, required=False):
     x = os.getenv(key, "")
 
@@ -1,40 +1,158 @@
-from .utils import get_env, positive_int
-from .events_buffer import EventsBuffer
+import importlib
+
+from .blob_client import BlobWriter, LazyBlobWriter
+from .utils import boolean, get_env, positive_float, positive_int
+from .events_buffer import EventsBuffer, RollupEventsBuffer, StreamingEventsBuffer
 from .events_writer import AsyncEventsWriter
+from .fan_out_writer import FanOutWriter
+from .sidecar import SidecarEventsWriter
+from .spill_store import SpillStore
 from .logging import get_logger
 
 
 logger = get_logger(__name__)
 
 
-def build_writer() -> AsyncEventsWriter:
+def build_writer() -> AsyncEventsWriter | SidecarEventsWriter:
+    """
+    Forwards the events to the uploader sidecar if `AFLO_SIDECAR_SOCKET` is
+    set, otherwise writes them in-process.
+    """
+
+    if get_env("AFLO_SIDECAR_SOCKET"):
+        logger.info("Building writer for: sidecar")
+        return SidecarEventsWriter()
+
+    return build_backend_writer()
+
+
+def build_backend_writer() -> AsyncEventsWriter:
     """
     Simple factory that chooses the blob backend based on an environment
     variable.
+
+    Several comma separated backends, e.g. "s3,api", are all written to.
     """
 
     backend = get_env("AFLO_BACKEND_TYPE", default="s3").lower()
 
     logger.info("Building writer for: %s", backend)
 
-    if backend == "api":
-        from .api_client import ApiClient
+    backends = [b.strip() for b in backend.split(",")]
 
-        client = ApiClient()
+    if len(set(backends)) != len(backends):
+        raise ValueError(f"Duplicate backends in AFLO_BACKEND_TYPE: {backend}")
 
-    elif backend == "s3":
-        from .s3_client import S3Client
+    spill = SpillStore() if get_env("AFLO_SPILL_DIR") else None
 
-        client = S3Client()
+    if len(backends) > 1:
+        client = FanOutWriter([build_client(b) for b in backends], spill=bool(spill))
+    else:
+        client = build_client(backends[0])
 
-    elif backend in ("azure", "azure-blob"):
-        from .azure_blob_client import AzureBlobClient
+    return AsyncEventsWriter(client, build_buffer(), spill=spill)
 
-        client = AzureBlobClient()
 
-    else:
+# module and class of the client of each backend, whether its keys are under
+# `AFLO_PATH`, and the settings it requires, at least one of each group
+_clients = {
+    "api": (".api_client", "ApiClient", False, [("AFLO_API_KEY",)]),
+    "s3": (
+        ".s3_client",
+        "S3Client",
+        True,
+        [("AWS_REGION",), ("AFLO_BUCKET_NAME",)],
+    ),
+    "azure": (
+        ".azure_blob_client",
+        "AzureBlobClient",
+        True,
+        [
+            ("AFLO_CONTAINER_NAME",),
+            ("AZURE_STORAGE_CONNECTION_STRING", "AZURE_STORAGE_ACCOUNT_NAME"),
+        ],
+    ),
+}
+_clients["azure-blob"] = _clients["azure"]
+
+
+def build_client(backend: str) -> BlobWriter:
+    """
+    Builds the client of the given backend.
+
+    Unless `AFLO_LAZY_BACKEND` is disabled, the client, along with its SDK, is
+    only imported and built on first use, which is during the warm up of the
+    writer, off the event loop. Missing settings are still checked here, so
+    that they fail the start up, but other errors building the client then
+    surface during the warm up, and the events are kept until they are fixed.
+    """
+    if backend not in _clients:
         raise ValueError(f"Unsupported AFLO_BACKEND_TYPE: {backend}")
 
+    module, name, has_path, required = _clients[backend]
+
+    for keys in required:
+        if not any(get_env(key) for key in keys):
+            raise ValueError(f"{' or '.join(keys)} must be set")
+
+    def factory() -> BlobWriter:
+        return getattr(importlib.import_module(module, __package__), name)()
+
+    if get_env("AFLO_LAZY_BACKEND", True, validate=boolean):
+        path = get_env("AFLO_PATH") if has_path else None
+        return LazyBlobWriter(name, factory, path)
+
+    return factory()
+
+
+def build_buffer() -> EventsBuffer:
+    """
+    Chooses the events buffer based on environment variables.
+    """
+
     max_buffer_size = int(get_env("AFLO_MAX_BUFFER_SIZE", 10000, validate=positive_int))
 
-    return AsyncEventsWriter(client, EventsBuffer(max_buffer_size=max_buffer_size))
+    rollup_granularity = int(
+        get_env("AFLO_ROLLUP_GRANULARITY", 0, validate=positive_int)
+    )
+
+    overflow = str(get_env("AFLO_BUFFER_OVERFLOW", "drop-new")).lower()
+
+    block_timeout = float(
+        get_env("AFLO_BUFFER_BLOCK_TIMEOUT", 1, validate=positive_float)
+    )
+
+    streaming = get_env("AFLO_STREAMING_COMPRESSION", False, validate=boolean)
+
+    if streaming and rollup_granularity:
+        raise ValueError(
+            "AFLO_STREAMING_COMPRESSION and AFLO_ROLLUP_GRANULARITY cannot be used together"
+        )
+
+    if streaming:
+        logger.info("Compressing events as they are buffered")
+
+        return StreamingEventsBuffer(
+            max_buffer_size=max_buffer_size,
+            overflow=overflow,
+            block_timeout=block_timeout,
+        )
+
+    if rollup_granularity:
+        logger.info("Rolling up events per %s seconds", rollup_granularity)
+
+        return RollupEventsBuffer(
+            max_buffer_size=max_buffer_size,
+            granularity=rollup_granularity,
+            overflow=overflow,
+            block_timeout=block_timeout,
+        )
+
+    compact = bool(get_env("AFLO_COMPACT_EVENTS", False, validate=boolean))
+
+    return EventsBuffer(
+        max_buffer_size=max_buffer_size,
+        compact=compact,
+        overflow=overflow,
+        block_timeout=block_timeout,
+    )
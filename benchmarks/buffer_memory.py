@@ -0,0 +1,63 @@
+"""
+Measures the memory retained per buffered event, with and without the compact
+event representation.
+
+Usage:
+
+    python -m benchmarks.buffer_memory [number of requests]
+"""
+
+import gc
+import json
+import pathlib
+import sys
+import tracemalloc
+
+from amberflo.events_buffer import EventsBuffer
+from amberflo.transformer import extract_events_from_log
+
+_resources_path = pathlib.Path(__file__).parent.parent / "tests" / "resources"
+
+
+def measure(compact: bool, requests: int) -> tuple[int, int]:
+    """
+    Returns the number of buffered events and the bytes they retain.
+    """
+    logs = [p.read_text() for p in sorted(_resources_path.glob("*.slo.json"))]
+
+    buffer = EventsBuffer(max_buffer_size=sys.maxsize, compact=compact)
+
+    gc.collect()
+    tracemalloc.start()
+    start, _ = tracemalloc.get_traced_memory()
+
+    for i in range(requests):
+        # parse every time, like LiteLLM building a new logging object
+        log = json.loads(logs[i % len(logs)])
+        log["id"] = f"request-{i}"
+
+        buffer._append(extract_events_from_log(log, send_metadata=True))
+
+        del log
+
+    gc.collect()
+    end, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return len(buffer.buffer), end - start
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+
+    for compact in (False, True):
+        events, size = measure(compact, requests)
+        label = "compact" if compact else "dict"
+        print(
+            f"{label:>8}: {events} events, {size / 1024 / 1024:.1f} MiB, "
+            f"{size / events:.0f} bytes/event"
+        )
+
+
+if __name__ == "__main__":
+    main()
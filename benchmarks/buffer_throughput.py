@@ -0,0 +1,76 @@
+"""
+Measures the throughput of adding events to the buffer, and the time it takes
+to extract them, at several buffer sizes.
+
+Usage:
+
+    python -m benchmarks.buffer_throughput [sizes...]
+"""
+
+import asyncio
+import sys
+import time
+
+from amberflo.events_buffer import EventsBuffer
+
+# a request produces around 5 events
+_events_per_request = 5
+
+
+def _make_events(i):
+    return [
+        {
+            "meterTimeInMillis": 1764355422941 + i,
+            "uniqueId": f"request-{i}",
+            "meterApiName": "llm_api_call",
+            "meterValue": 1,
+            "dimensions": {"model": "gpt-4o", "team": "unknown"},
+        }
+        for _ in range(_events_per_request)
+    ]
+
+
+async def measure(size: int, rounds: int = 5) -> tuple[float, float]:
+    """
+    Returns the add throughput, in events per second, and the median
+    extract time, in milliseconds.
+    """
+    requests = [_make_events(i) for i in range(size // _events_per_request)]
+
+    buffer = EventsBuffer(max_buffer_size=size)
+
+    add_seconds = 0.0
+    extract_seconds = []
+
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for events in requests:
+            await buffer.add_events(events)
+        add_seconds += time.perf_counter() - start
+
+        start = time.perf_counter()
+        extracted = await buffer.extract_all()
+        extract_seconds.append(time.perf_counter() - start)
+
+        # not part of the measurement
+        del extracted
+
+    throughput = rounds * size / add_seconds
+    extract_ms = sorted(extract_seconds)[rounds // 2] * 1000
+
+    return throughput, extract_ms
+
+
+def main():
+    sizes = [int(x) for x in sys.argv[1:]] or [10000, 50000, 100000]
+
+    for size in sizes:
+        throughput, extract_ms = asyncio.run(measure(size))
+        print(
+            f"{size:>7} events: add {throughput / 1000:,.0f}k events/s, "
+            f"extract {extract_ms:.3f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Compares the JSON codecs and gzip levels on batches of realistic events.
+
+Usage:
+
+    python -m benchmarks.codec [batch size]
+"""
+
+import json
+import pathlib
+import sys
+import time
+
+from amberflo.codec import encode, get_codec
+from amberflo.transformer import extract_events_from_log
+
+_resources_path = pathlib.Path(__file__).parent.parent / "tests" / "resources"
+
+_levels = (1, 3, 6, 9)
+
+
+def _events(count: int) -> list[dict]:
+    logs = [
+        json.loads(p.read_text()) for p in sorted(_resources_path.glob("*.slo.json"))
+    ]
+    events = [e for log in logs for e in extract_events_from_log(log) or ()]
+
+    # distinct ids, as in a real batch
+    return [
+        dict(
+            events[i % len(events)],
+            uniqueId=f"{events[i % len(events)]['uniqueId']}-{i}",
+        )
+        for i in range(count)
+    ]
+
+
+def _codecs():
+    for name in ("json", "orjson", "msgspec"):
+        try:
+            yield get_codec(name)
+        except ValueError:
+            print(f"{name} is not installed")
+
+
+def measure(
+    codec, level: int, events: list[dict], rounds: int = 5
+) -> tuple[float, int]:
+    """
+    Returns the median encoding time, in milliseconds, and the body size.
+    """
+    times = []
+    body = b""
+
+    for _ in range(rounds):
+        start = time.perf_counter()
+        body = encode(events, codec, level)
+        times.append(time.perf_counter() - start)
+
+    return sorted(times)[rounds // 2] * 1000, len(body)
+
+
+def measure_json(codec, events: list[dict], rounds: int = 5) -> tuple[float, int]:
+    times = []
+    data = b""
+
+    for _ in range(rounds):
+        start = time.perf_counter()
+        data = codec.dumps(events)
+        times.append(time.perf_counter() - start)
+
+    return sorted(times)[rounds // 2] * 1000, len(data)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    events = _events(count)
+
+    print(f"{count} events")
+
+    for codec in _codecs():
+        json_ms, json_bytes = measure_json(codec, events)
+        print(f"{codec.name:>8} encode only: {json_ms:7.2f} ms, {json_bytes:,} bytes")
+
+        for level in _levels:
+            ms, size = measure(codec, level, events)
+            print(
+                f"{codec.name:>8} gzip {level}: {ms:7.2f} ms, {size:,} bytes "
+                f"({size / json_bytes:.3f} ratio)"
+            )
+
+
+if __name__ == "__main__":
+    main()
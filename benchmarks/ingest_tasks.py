@@ -0,0 +1,96 @@
+"""
+Measures the task churn and event loop time of handing events to the writer,
+with a task per write and with the ingestion queue.
+
+Usage:
+
+    python -m benchmarks.ingest_tasks [number of requests]
+"""
+
+import asyncio
+import json
+import pathlib
+import sys
+import time
+from datetime import datetime
+
+from amberflo.blob_client import BlobWriter
+from amberflo.callback import Callback
+from amberflo.events_buffer import EventsBuffer
+from amberflo.events_writer import AsyncEventsWriter
+from amberflo.utils import make_key
+
+_resources_path = pathlib.Path(__file__).parent.parent / "tests" / "resources"
+
+# requests handled between two yields to the event loop
+_burst = 100
+
+
+class NullWriter(BlobWriter):
+    async def put_object(self, key: str, body: bytes) -> None:
+        pass
+
+    def make_key(self, timestamp: datetime) -> str:
+        return make_key(timestamp, "path")
+
+    async def warm_up(self) -> None:
+        pass
+
+
+async def measure(queue_size: int, requests: int) -> tuple[int, float, float]:
+    """
+    Returns the number of tasks created, the time spent in the callback per
+    request, in microseconds, and the total time until the events are
+    flushed, in milliseconds.
+    """
+    logs = [
+        {"standard_logging_object": json.loads(p.read_text())}
+        for p in sorted(_resources_path.glob("*.slo.json"))
+    ]
+
+    writer = AsyncEventsWriter(NullWriter(), EventsBuffer(), queue_size=queue_size)
+    callback = Callback(writer)
+
+    tasks = 0
+    loop = asyncio.get_running_loop()
+
+    def count_tasks(loop, coro, **kwargs):
+        nonlocal tasks
+        tasks += 1
+        return asyncio.Task(coro, loop=loop, **kwargs)
+
+    loop.set_task_factory(count_tasks)
+
+    callback_seconds = 0.0
+    start = time.perf_counter()
+
+    for i in range(requests):
+        call_start = time.perf_counter()
+        await callback(logs[i % len(logs)])
+        callback_seconds += time.perf_counter() - call_start
+
+        if i % _burst == 0:
+            await asyncio.sleep(0)
+
+    await callback.shutdown()
+
+    total_ms = (time.perf_counter() - start) * 1000
+
+    loop.set_task_factory(None)
+
+    return tasks, callback_seconds / requests * 1e6, total_ms
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+
+    for name, queue_size in (("task per write", 0), ("ingestion queue", 10000)):
+        tasks, callback_us, total_ms = asyncio.run(measure(queue_size, requests))
+        print(
+            f"{name:>15}: {tasks} tasks, callback {callback_us:.1f} us/request, "
+            f"total {total_ms:,.0f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
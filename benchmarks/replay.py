@@ -0,0 +1,242 @@
+"""
+Replays logging objects through the callback at a target request rate,
+against a stub backend with injected latency, to measure the overhead of the
+callback on the proxy.
+
+Reports:
+- the event loop lag, i.e. how late a periodic timer fires;
+- the time spent in the callback per call;
+- the number of dropped events;
+- the duration of the flushes;
+- the achieved request and event throughput.
+
+The writer is configured by the usual environment variables (batch size,
+buffer, serializer, ingestion queue, etc), except for the backend.
+
+Usage:
+
+    python -m benchmarks.replay [--rate 5000] [--duration 10] [--latency 50]
+        [--logs logs.jsonl] [--json]
+"""
+
+import argparse
+import asyncio
+import json
+import pathlib
+import random
+import statistics
+import time
+from datetime import datetime
+
+from amberflo.blob_client import BlobWriter
+from amberflo.callback import Callback
+from amberflo.events_writer import AsyncEventsWriter
+from amberflo.utils import make_key
+from amberflo.writer_factory import build_buffer
+
+_resources_path = pathlib.Path(__file__).parent.parent / "tests" / "resources"
+
+# seconds between two checks of the event loop lag
+_lag_interval = 0.01
+
+# seconds between two batches of requests
+_tick = 0.001
+
+
+class SlowBackend(BlobWriter):
+    """
+    Stub blob writer whose uploads take `latency` seconds, plus up to `jitter`.
+    """
+
+    def __init__(self, latency: float, jitter: float):
+        self.latency = latency
+        self.jitter = jitter
+        self.objects = 0
+        self.bytes = 0
+
+    async def put_object(self, key: str, body: bytes) -> None:
+        await asyncio.sleep(self.latency + random.uniform(0, self.jitter))
+        self.objects += 1
+        self.bytes += len(body)
+
+    def make_key(self, timestamp: datetime) -> str:
+        return make_key(timestamp, "replay")
+
+    async def warm_up(self) -> None:
+        pass
+
+
+class TimedEventsWriter(AsyncEventsWriter):
+    """
+    Records the number of events and the duration of each flush.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.flushed_events = 0
+        self.flush_seconds: list[float] = []
+
+    async def _flush_buffer(self) -> None:
+        self.flushed_events += self.buffer.size
+
+        start = time.perf_counter()
+        await super()._flush_buffer()
+        self.flush_seconds.append(time.perf_counter() - start)
+
+
+def _load_logs(path: str | None) -> list[dict]:
+    """
+    Loads the logs from a file with a logging object per line, or else the
+    samples in `tests/resources`.
+    """
+    if path:
+        lines = pathlib.Path(path).read_text().splitlines()
+        return [json.loads(line) for line in lines if line.strip()]
+
+    return [
+        json.loads(p.read_text()) for p in sorted(_resources_path.glob("*.slo.json"))
+    ]
+
+
+def _percentiles(samples: list[float], unit: float) -> dict:
+    if len(samples) < 2:
+        return {"p50": None, "p99": None, "max": max(samples, default=None)}
+
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {
+        "p50": cuts[49] * unit,
+        "p99": cuts[98] * unit,
+        "max": max(samples) * unit,
+    }
+
+
+async def _monitor_lag(samples: list[float]) -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + _lag_interval
+        await asyncio.sleep(_lag_interval)
+        samples.append(max(0.0, loop.time() - expected))
+
+
+async def replay(
+    logs: list[dict], rate: float, duration: float, latency: float, jitter: float
+) -> dict:
+    backend = SlowBackend(latency, jitter)
+    buffer = build_buffer()
+
+    dropped = 0
+
+    def count_dropped(events):
+        nonlocal dropped
+        dropped += len(events)
+
+    buffer.on_drop = count_dropped
+
+    writer = TimedEventsWriter(backend, buffer)
+    callback = Callback(writer)
+
+    lag_samples: list[float] = []
+    monitor = asyncio.create_task(_monitor_lag(lag_samples))
+
+    callback_seconds: list[float] = []
+    sent = 0
+
+    start = time.perf_counter()
+    elapsed = 0.0
+
+    while elapsed < duration:
+        due = int(elapsed * rate) - sent
+
+        for _ in range(due):
+            log = logs[sent % len(logs)]
+            kwargs = {"standard_logging_object": dict(log, id=f"{log['id']}-{sent}")}
+
+            call_start = time.perf_counter()
+            await callback(kwargs)
+            callback_seconds.append(time.perf_counter() - call_start)
+
+            sent += 1
+
+        await asyncio.sleep(_tick)
+        elapsed = time.perf_counter() - start
+
+    shutdown_start = time.perf_counter()
+    completed = await callback.shutdown()
+    shutdown_seconds = time.perf_counter() - shutdown_start
+
+    monitor.cancel()
+
+    return {
+        "target_rate": rate,
+        "achieved_rate": sent / elapsed,
+        "requests": sent,
+        "events": writer.flushed_events,
+        "event_rate": writer.flushed_events / (elapsed + shutdown_seconds),
+        "dropped_events": dropped,
+        "loop_lag_ms": _percentiles(lag_samples, 1000),
+        "callback_us": _percentiles(callback_seconds, 1e6),
+        "flush_ms": _percentiles(writer.flush_seconds, 1000),
+        "flushes": len(writer.flush_seconds),
+        "objects": backend.objects,
+        "bytes": backend.bytes,
+        "shutdown_s": shutdown_seconds,
+        "shutdown_completed": completed,
+    }
+
+
+def _print(results: dict) -> None:
+    def fmt(p):
+        return ", ".join(
+            f"{k} {'-' if v is None else f'{v:,.1f}'}" for k, v in p.items()
+        )
+
+    print(
+        f"requests: {results['requests']} "
+        f"({results['achieved_rate']:,.0f}/s of {results['target_rate']:,.0f}/s)"
+    )
+    print(
+        f"events: {results['events']} ({results['event_rate']:,.0f}/s), "
+        f"dropped: {results['dropped_events']}"
+    )
+    print(f"loop lag (ms): {fmt(results['loop_lag_ms'])}")
+    print(f"callback (us): {fmt(results['callback_us'])}")
+    print(f"flush (ms): {fmt(results['flush_ms'])} over {results['flushes']} flushes")
+    print(f"uploads: {results['objects']} objects, {results['bytes']:,} bytes")
+    print(
+        f"shutdown: {results['shutdown_s']:.2f} s "
+        f"({'completed' if results['shutdown_completed'] else 'timed out'})"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay logs through the callback")
+    parser.add_argument("--rate", type=float, default=5000, help="requests per second")
+    parser.add_argument("--duration", type=float, default=10, help="seconds")
+    parser.add_argument(
+        "--latency", type=float, default=50, help="upload latency, in milliseconds"
+    )
+    parser.add_argument(
+        "--jitter", type=float, default=0, help="upload latency jitter, in milliseconds"
+    )
+    parser.add_argument("--logs", help="file with a logging object per line")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    results = asyncio.run(
+        replay(
+            _load_logs(args.logs),
+            args.rate,
+            args.duration,
+            args.latency / 1000,
+            args.jitter / 1000,
+        )
+    )
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        _print(results)
+
+
+if __name__ == "__main__":
+    main()
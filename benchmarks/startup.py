@@ -0,0 +1,80 @@
+"""
+Measures the time it takes to import the LiteLLM callback, which builds the
+writer, for each backend, with the client built lazily and eagerly.
+
+Each import runs in a fresh interpreter, so this includes the imports of the
+storage SDKs, but not the connections to the storage, which are only opened
+on warm up.
+
+Usage:
+
+    python -m benchmarks.startup [number of runs]
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+
+# enough to build each client, without reaching the storage
+_env = {
+    "AFLO_API_KEY": "key",
+    "AFLO_BUCKET_NAME": "bucket",
+    "AWS_REGION": "us-west-2",
+    "AFLO_CONTAINER_NAME": "container",
+    "AZURE_STORAGE_CONNECTION_STRING": (
+        "DefaultEndpointsProtocol=https;AccountName=account;"
+        "AccountKey=a2V5;EndpointSuffix=core.windows.net"
+    ),
+    "AFLO_METRICS_EXPORTER": "none",
+}
+
+_script = """
+import sys, time
+start = time.perf_counter()
+import amberflo.litellm
+print(time.perf_counter() - start, len(sys.modules))
+"""
+
+
+def measure(backend: str, lazy: bool) -> tuple[float, int]:
+    """
+    Returns the time to import the callback, in milliseconds, and the number
+    of modules loaded.
+    """
+    env = {
+        **os.environ,
+        **_env,
+        "AFLO_BACKEND_TYPE": backend,
+        "AFLO_LAZY_BACKEND": str(lazy).lower(),
+    }
+
+    output = subprocess.run(
+        [sys.executable, "-c", _script],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.split()
+
+    return float(output[0]) * 1000, int(output[1])
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    for backend in ("api", "s3", "azure-blob"):
+        for lazy in (True, False):
+            results = [measure(backend, lazy) for _ in range(runs)]
+
+            import_ms = statistics.median(ms for ms, _ in results)
+            modules = results[-1][1]
+
+            print(
+                f"{backend:>10} {'lazy' if lazy else 'eager':>5}: "
+                f"{import_ms:,.0f} ms, {modules} modules"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+Benchmark suite of the stages of the pipeline, whose results are written as
+JSON, so they can be compared across releases.
+
+Stages:
+- transform: `extract_events_from_log`, per log;
+- buffer: `EventsBuffer` add, per request, and extract, at several sizes;
+- serialize: `_prepare_body`, at several batch sizes;
+- end_to_end: `AsyncEventsWriter.async_write` into a stub blob writer.
+
+Throughputs are per second, latencies in microseconds, and memory in bytes.
+
+The logs are the samples in `tests/resources`, repeated as needed.
+
+Usage:
+
+    python -m benchmarks.suite [--output results.json] [--scale 1.0]
+"""
+
+import argparse
+import asyncio
+import json
+import pathlib
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from amberflo.blob_client import BlobWriter
+from amberflo.events_buffer import EventsBuffer
+from amberflo.events_writer import AsyncEventsWriter, _prepare_body
+from amberflo.transformer import extract_events_from_log
+from amberflo.utils import make_key
+
+_resources_path = pathlib.Path(__file__).parent.parent / "tests" / "resources"
+
+
+def _load_logs() -> list[dict]:
+    return [
+        json.loads(p.read_text()) for p in sorted(_resources_path.glob("*.slo.json"))
+    ]
+
+
+def _load_requests() -> list[list[dict]]:
+    """
+    The events of each sample log, as the callback hands them to the writer.
+    """
+    return [e for e in map(extract_events_from_log, _load_logs()) if e]
+
+
+def _events(count: int) -> list[dict]:
+    events = [e for request in _load_requests() for e in request]
+    return [dict(events[i % len(events)]) for i in range(count)]
+
+
+def _latencies(samples_ns: list[int]) -> dict:
+    """
+    Percentiles of the samples, in microseconds.
+    """
+    cuts = statistics.quantiles(samples_ns, n=100, method="inclusive")
+    return {
+        "p50_us": cuts[49] / 1000,
+        "p95_us": cuts[94] / 1000,
+        "p99_us": cuts[98] / 1000,
+        "max_us": max(samples_ns) / 1000,
+    }
+
+
+def _peak_memory(fn, *args) -> int:
+    tracemalloc.start()
+    try:
+        fn(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_transform(calls: int) -> dict:
+    logs = _load_logs()
+    inputs = [logs[i % len(logs)] for i in range(calls)]
+
+    samples = []
+    for log in inputs:
+        start = time.perf_counter_ns()
+        extract_events_from_log(log)
+        samples.append(time.perf_counter_ns() - start)
+
+    def transform_all():
+        return [extract_events_from_log(log) for log in inputs]
+
+    return {
+        "calls": calls,
+        "throughput": calls / (sum(samples) / 1e9),
+        **_latencies(samples),
+        "peak_memory": _peak_memory(transform_all),
+    }
+
+
+async def _fill(buffer: EventsBuffer, requests: list[list[dict]]) -> list[int]:
+    samples = []
+    for events in requests:
+        start = time.perf_counter_ns()
+        await buffer.add_events(events)
+        samples.append(time.perf_counter_ns() - start)
+    return samples
+
+
+def bench_buffer(size: int) -> dict:
+    requests = _load_requests()
+
+    batch = []
+    while sum(map(len, batch)) < size:
+        batch.append([dict(e) for e in requests[len(batch) % len(requests)]])
+    events = sum(map(len, batch))
+
+    buffer = EventsBuffer(max_buffer_size=events)
+
+    tracemalloc.start()
+    samples = asyncio.run(_fill(buffer, batch))
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    async def extract():
+        start = time.perf_counter_ns()
+        extracted = await buffer.extract_all()
+        elapsed = time.perf_counter_ns() - start
+        del extracted
+        return elapsed
+
+    extract_ns = asyncio.run(extract())
+
+    return {
+        "events": events,
+        "add_throughput": events / (sum(samples) / 1e9),
+        **{f"add_{k}": v for k, v in _latencies(samples).items()},
+        "extract_us": extract_ns / 1000,
+        "retained_memory": retained,
+    }
+
+
+def bench_serialize(count: int, rounds: int = 5) -> dict:
+    events = _events(count)
+
+    samples = []
+    body = b""
+    for _ in range(rounds):
+        start = time.perf_counter_ns()
+        body, _ = _prepare_body(events)
+        samples.append(time.perf_counter_ns() - start)
+
+    return {
+        "events": count,
+        "throughput": count * rounds / (sum(samples) / 1e9),
+        **_latencies(samples),
+        "body_bytes": len(body),
+        "peak_memory": _peak_memory(_prepare_body, events),
+    }
+
+
+class StubWriter(BlobWriter):
+    def __init__(self):
+        self.objects = 0
+        self.bytes = 0
+
+    async def put_object(self, key: str, body: bytes) -> None:
+        self.objects += 1
+        self.bytes += len(body)
+
+    def make_key(self, timestamp: datetime) -> str:
+        return make_key(timestamp, "path")
+
+    async def warm_up(self) -> None:
+        pass
+
+
+async def _write_all(requests: list[list[dict]]) -> dict:
+    stub = StubWriter()
+    writer = AsyncEventsWriter(stub, EventsBuffer())
+
+    samples = []
+    start = time.perf_counter()
+
+    for events in requests:
+        call_start = time.perf_counter_ns()
+        await writer.async_write(events)
+        samples.append(time.perf_counter_ns() - call_start)
+
+    await writer.shutdown()
+
+    elapsed = time.perf_counter() - start
+
+    return {
+        "requests": len(requests),
+        "throughput": len(requests) / elapsed,
+        **{f"write_{k}": v for k, v in _latencies(samples).items()},
+        "objects": stub.objects,
+        "bytes": stub.bytes,
+    }
+
+
+def bench_end_to_end(count: int) -> dict:
+    requests = _load_requests()
+    batch = [[dict(e) for e in requests[i % len(requests)]] for i in range(count)]
+    return asyncio.run(_write_all(batch))
+
+
+def run(scale: float = 1.0) -> dict:
+    def scaled(x):
+        return max(100, int(x * scale))
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scale": scale,
+        "results": {
+            "transform": bench_transform(scaled(20000)),
+            "buffer": [bench_buffer(scaled(n)) for n in (10000, 50000, 100000)],
+            "serialize": [bench_serialize(scaled(n)) for n in (1000, 10000, 100000)],
+            "end_to_end": bench_end_to_end(scaled(20000)),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark suite of the pipeline")
+    parser.add_argument("--output", help="file to write the results to")
+    parser.add_argument(
+        "--scale", type=float, default=1.0, help="multiplier of the sizes"
+    )
+    args = parser.parse_args()
+
+    results = json.dumps(run(args.scale), indent=2)
+
+    if args.output:
+        pathlib.Path(args.output).write_text(results + "\n")
+    else:
+        sys.stdout.write(results + "\n")
+
+
+if __name__ == "__main__":
+    main()
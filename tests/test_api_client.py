@@ -1,8 +1,11 @@
+import gzip
+import json
+import threading
 import unittest
 from unittest.mock import AsyncMock, patch
 from tenacity import wait_none
 
-from amberflo.api_client import ApiClient
+from amberflo.api_client import ApiClient, _split_body
 
 
 class TestApiClient(unittest.IsolatedAsyncioTestCase):
@@ -77,3 +80,72 @@ class TestApiClient(unittest.IsolatedAsyncioTestCase):
             await client.session.close()
 
         mock_post.assert_called_with(endpoint, data=data)
+
+    @patch("aiohttp.ClientSession.post")
+    async def test_large_request_is_split(self, mock_post):
+        mock_response = AsyncMock()
+        mock_response.status = 200
+        mock_response.ok = True
+
+        mock_post.return_value.__aenter__.return_value = mock_response
+
+        endpoint = "https://localhost/ingest"
+
+        # random-ish values, so that they do not compress too well
+        events = [{"uniqueId": str(hash(str(i))), "meterValue": i} for i in range(1000)]
+        data = gzip.compress(json.dumps(events).encode())
+
+        client = ApiClient(api_key="test", endpoint=endpoint, max_payload_bytes=2000)
+        try:
+            await client.put_object("key-123", data)
+        finally:
+            await client.close()
+
+        self.assertGreater(mock_post.call_count, 1)
+
+        sent = []
+        for call in mock_post.call_args_list:
+            body = call.kwargs["data"]
+            self.assertLessEqual(len(body), 2000)
+            sent += json.loads(gzip.decompress(body))
+
+        self.assertEqual(sent, events)
+
+    @patch("aiohttp.ClientSession.post")
+    async def test_large_request_is_split_in_a_dedicated_thread(self, mock_post):
+        mock_response = AsyncMock()
+        mock_response.status = 200
+        mock_response.ok = True
+
+        mock_post.return_value.__aenter__.return_value = mock_response
+
+        events = [{"uniqueId": str(i), "meterValue": i} for i in range(100)]
+        data = gzip.compress(json.dumps(events).encode())
+
+        threads = []
+
+        def split_body(*args):
+            threads.append(threading.current_thread().name)
+            return _split_body(*args)
+
+        client = ApiClient(api_key="test", max_payload_bytes=100)
+        try:
+            with patch("amberflo.api_client._split_body", split_body):
+                await client.put_object("key-123", data)
+        finally:
+            await client.close()
+
+        self.assertEqual(len(threads), 1)
+        self.assertTrue(threads[0].startswith("aflo-api"))
+
+    async def test_session_is_created_lazily(self):
+        client = ApiClient(api_key="test", max_connections=3)
+
+        self.assertIsNone(client._session)
+
+        session = client.session
+        try:
+            self.assertIs(client.session, session)
+            self.assertEqual(session.connector.limit, 3)  # type: ignore
+        finally:
+            await client.close()
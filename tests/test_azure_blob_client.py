@@ -0,0 +1,80 @@
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from azure.core.exceptions import ServiceRequestError
+from azure.core.pipeline import PipelineContext, PipelineRequest
+from azure.core.rest import HttpRequest
+from azure.storage.blob.aio import ContainerClient
+
+from amberflo import metrics
+from amberflo.azure_blob_client import AzureBlobClient, _CountingRetry
+
+
+_connection_string = (
+    "DefaultEndpointsProtocol=https;AccountName=test;"
+    "AccountKey=dGVzdA==;EndpointSuffix=core.windows.net"
+)
+
+
+class TestAzureBlobClient(unittest.IsolatedAsyncioTestCase):
+    """
+    Test class for the AzureBlobClient.
+    """
+
+    async def asyncSetUp(self):
+        self.client = AzureBlobClient(
+            connection_string=_connection_string,
+            container_name="container",
+            pool_size=3,
+            max_single_put_size=1024,
+            max_concurrency=2,
+        )
+
+    async def asyncTearDown(self):
+        await self.client.close()
+
+    @patch.object(ContainerClient, "upload_blob", new_callable=AsyncMock)
+    async def test_container_client_is_reused(self, mock_upload):
+        await self.client.put_object("key-1", b"body-1")
+        container_client = self.client.container_client
+
+        await self.client.put_object("key-2", b"body-2")
+        self.assertIs(self.client.container_client, container_client)
+
+        self.assertEqual(mock_upload.call_count, 2)
+
+        _, kwargs = mock_upload.call_args
+        self.assertEqual(kwargs["max_concurrency"], 2)
+        self.assertEqual(kwargs["content_settings"].content_encoding, "gzip")
+
+    async def test_client_is_tuned(self):
+        container_client = self.client.container_client
+
+        self.assertEqual(container_client._config.max_single_put_size, 1024)
+
+        session = self.client._session
+        assert session is not None
+        self.assertEqual(session.connector.limit, 3)  # type: ignore
+
+    @patch.object(ContainerClient, "get_container_properties", new_callable=AsyncMock)
+    async def test_warm_up(self, mock_properties):
+        await self.client.warm_up()
+
+        mock_properties.assert_called_once()
+
+    async def test_retries_are_counted(self):
+        retry = _CountingRetry(retry_total=1)
+        request = PipelineRequest(
+            HttpRequest("PUT", "https://test/container/key"), PipelineContext(None)
+        )
+        settings = retry.configure_retries(request)
+        error = ServiceRequestError("boom!")
+
+        retries = metrics.upload_retries.value(backend="AzureBlobClient")
+
+        self.assertTrue(retry.increment(settings, request.http_request, error=error))
+        self.assertFalse(retry.increment(settings, request.http_request, error=error))
+
+        self.assertEqual(
+            metrics.upload_retries.value(backend="AzureBlobClient"), retries + 1
+        )
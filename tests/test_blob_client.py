@@ -0,0 +1,83 @@
+import unittest
+from datetime import datetime, timezone
+
+from amberflo.blob_client import BlobWriter, LazyBlobWriter
+from amberflo.upload_scheduler import UploadScheduler
+from amberflo.utils import make_key
+
+
+class RecordingWriter(BlobWriter):
+    def __init__(self):
+        self.items = []
+        self.warmed_up = False
+
+    async def put_object(self, key: str, body: bytes) -> None:
+        self.items.append((key, body))
+
+    def make_key(self, timestamp: datetime) -> str:
+        return make_key(timestamp, "path")
+
+    async def warm_up(self) -> None:
+        self.warmed_up = True
+
+
+class TestLazyBlobWriter(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.built = []
+
+        def factory():
+            writer = RecordingWriter()
+            self.built.append(writer)
+            return writer
+
+        self.unit = LazyBlobWriter("RecordingWriter", factory, "path")
+
+    async def test_builds_on_first_use(self):
+        self.assertEqual(self.built, [])
+
+        await self.unit.warm_up()
+
+        self.assertEqual(len(self.built), 1)
+        self.assertTrue(self.built[0].warmed_up)
+
+    async def test_builds_once_and_delegates(self):
+        key = self.unit.make_key(datetime(2025, 1, 1, tzinfo=timezone.utc))
+
+        # keys are made without building
+        self.assertEqual(self.built, [])
+
+        await self.unit.put_object(key, b"body")
+        await self.unit.put_object(key, b"more")
+
+        self.assertEqual(len(self.built), 1)
+        self.assertEqual(self.built[0].items, [(key, b"body"), (key, b"more")])
+        self.assertTrue(key.startswith("path/"))
+
+    def test_is_labeled_after_the_actual_writer(self):
+        scheduler = UploadScheduler(self.unit)
+
+        self.assertEqual(scheduler.backend, "RecordingWriter")
+        self.assertEqual(self.built, [])
+
+    async def test_is_not_ready_until_it_can_be_built(self):
+        now = [0.0]
+        attempts = []
+
+        def factory():
+            attempts.append(now[0])
+            raise ValueError("AFLO_BUCKET_NAME is required")
+
+        unit = LazyBlobWriter("S3Client", factory, clock=lambda: now[0])
+
+        self.assertFalse(await unit.ready())
+
+        # not tried again right away
+        now[0] = 1
+        self.assertFalse(await unit.ready())
+        self.assertEqual(attempts, [0.0])
+
+        now[0] = unit.retry_interval
+        self.assertFalse(await unit.ready())
+        self.assertEqual(attempts, [0.0, unit.retry_interval])
+
+        self.assertTrue(await self.unit.ready())
@@ -0,0 +1,122 @@
+import asyncio
+import unittest
+
+from amberflo import metrics
+from amberflo.callback import Callback
+from amberflo.dedup import DedupIndex
+from amberflo.transformer import extract_events_from_log
+
+from .test_transformer import _load_log
+
+
+class RecordingWriter:
+    writes_nowait = False
+
+    def __init__(self):
+        self.events = []
+        self.shut_down = False
+
+    async def async_write(self, events):
+        self.events.extend(events)
+
+    async def shutdown(self, timeout=None):
+        self.shut_down = True
+        return True
+
+
+class TestCallback(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+
+    def _run(self, callback, logs):
+        async def run():
+            for log in logs:
+                await callback({"standard_logging_object": log})
+            return await callback.shutdown(timeout=5)
+
+        return self.loop.run_until_complete(run())
+
+    def test_writes_events(self):
+        writer = RecordingWriter()
+        callback = Callback(writer)  # type: ignore[arg-type]
+        log = _load_log("openai-gpt-4o.completion")
+
+        self.assertTrue(self._run(callback, [log]))
+
+        self.assertEqual(writer.events, extract_events_from_log(log))
+        self.assertTrue(writer.shut_down)
+
+    def test_duplicate_logs_are_dropped(self):
+        writer = RecordingWriter()
+        callback = Callback(writer, dedup=DedupIndex(ttl=60))  # type: ignore[arg-type]
+        log = _load_log("openai-gpt-4o.completion")
+        dropped = metrics.duplicates_dropped.value()
+
+        self._run(callback, [log, log, _load_log("openai-rate-limit.completion")])
+
+        self.assertEqual(metrics.duplicates_dropped.value() - dropped, 1)
+        self.assertEqual(
+            writer.events,
+            extract_events_from_log(log)
+            + extract_events_from_log(_load_log("openai-rate-limit.completion")),
+        )
+
+    def test_deferred_transform_writes_the_same_events(self):
+        writer = RecordingWriter()
+        callback = Callback(writer, deferred_transform=True, transform_batch_size=2)  # type: ignore[arg-type]
+        logs = [
+            _load_log("openai-gpt-4o.completion"),
+            _load_log("openai-rate-limit.completion"),
+            _load_log("bedrock-stability-v1.image_gen"),
+        ]
+
+        self.assertTrue(self._run(callback, logs))
+
+        expected = [e for log in logs for e in extract_events_from_log(log)]
+        self.assertEqual(writer.events, expected)
+        self.assertEqual(callback._pending_logs, [])
+        self.assertTrue(writer.shut_down)
+
+    def test_deferred_transform_survives_bad_logs(self):
+        writer = RecordingWriter()
+        callback = Callback(writer, deferred_transform=True)  # type: ignore[arg-type]
+        good = _load_log("openai-gpt-4o.completion")
+        bad = _load_log("openai-gpt-4o.completion")
+        bad["startTime"] = "not a time"
+
+        self._run(callback, [bad, good])
+
+        self.assertEqual(writer.events, extract_events_from_log(good))
+
+    def test_deferred_transform_drops_logs_beyond_the_limit(self):
+        writer = RecordingWriter()
+        callback = Callback(writer, deferred_transform=True, max_pending_logs=2)  # type: ignore[arg-type]
+        logs = [_load_log("openai-gpt-4o.completion") for _ in range(3)]
+
+        dropped = metrics.events_dropped.value(reason="transform_pending_full")
+
+        self._run(callback, logs)
+
+        self.assertEqual(
+            metrics.events_dropped.value(reason="transform_pending_full"), dropped + 1
+        )
+        self.assertEqual(writer.events, extract_events_from_log(logs[0]) * 2)
+
+    def test_deferred_transform_restarts_after_shutdown(self):
+        writer = RecordingWriter()
+        callback = Callback(writer, deferred_transform=True)  # type: ignore[arg-type]
+        log = _load_log("openai-gpt-4o.completion")
+
+        self._run(callback, [log])
+        self._run(callback, [log])
+
+        self.assertEqual(writer.events, extract_events_from_log(log) * 2)
+        self.assertEqual(callback._pending_logs, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
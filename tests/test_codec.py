@@ -0,0 +1,64 @@
+import gzip
+import json
+import os
+import unittest
+from unittest import mock
+
+from amberflo.codec import decode, encode, get_codec, get_gzip_level
+from amberflo.event_record import EventRecord
+
+_events = [
+    {
+        "meterTimeInMillis": 1764355422941,
+        "uniqueId": "a",
+        "meterApiName": "llm_api_call",
+        "meterValue": 1.5,
+        "dimensions": {"model": "gpt-4o", "team": "équipe"},
+    },
+    EventRecord.from_dict({"meterApiName": "llm_api_call", "meterValue": 2}),
+]
+
+_expected = [_events[0], {"meterApiName": "llm_api_call", "meterValue": 2}]
+
+
+def _installed_codecs():
+    for name in ("json", "orjson", "msgspec"):
+        try:
+            yield get_codec(name)
+        except ValueError:
+            pass
+
+
+class TestCodec(unittest.TestCase):
+    def test_codecs_produce_the_same_json(self):
+        for codec in _installed_codecs():
+            with self.subTest(codec=codec.name):
+                body = encode(_events, codec, 6)
+
+                self.assertEqual(json.loads(gzip.decompress(body)), _expected)
+                self.assertEqual(decode(body, codec), _expected)
+
+    def test_auto_codec_prefers_a_fast_encoder(self):
+        names = [c.name for c in _installed_codecs()]
+        expected = next((n for n in ("orjson", "msgspec") if n in names), "json")
+
+        self.assertEqual(get_codec("auto").name, expected)
+
+    def test_unsupported_codec(self):
+        with self.assertRaises(ValueError):
+            get_codec("yaml")
+
+    def test_gzip_level(self):
+        self.assertEqual(get_gzip_level(), 9)
+        self.assertEqual(get_gzip_level(3), 3)
+
+        with mock.patch.dict(os.environ, {"AFLO_GZIP_LEVEL": "1"}):
+            self.assertEqual(get_gzip_level(3), 1)
+
+        with mock.patch.dict(os.environ, {"AFLO_GZIP_LEVEL": "10"}):
+            with self.assertRaises(ValueError):
+                get_gzip_level()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+
+from amberflo.dedup import DedupIndex
+
+
+class TestDedupIndex(unittest.TestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.unit = DedupIndex(ttl=10, max_size=3, clock=lambda: self.now)
+
+    def test_duplicates_are_seen(self):
+        self.assertFalse(self.unit.seen("a"))
+        self.assertFalse(self.unit.seen("b"))
+        self.assertTrue(self.unit.seen("a"))
+        self.assertTrue(self.unit.seen("b"))
+
+    def test_keys_expire(self):
+        self.unit.seen("a")
+        self.now = 5
+        self.unit.seen("b")
+
+        self.now = 10
+        self.assertFalse(self.unit.seen("a"))
+        self.assertTrue(self.unit.seen("b"))
+        self.assertEqual(len(self.unit), 2)
+
+    def test_size_is_bounded(self):
+        for key in "abcd":
+            self.unit.seen(key)
+
+        self.assertEqual(len(self.unit), 3)
+
+        # the oldest key was forgotten
+        self.assertFalse(self.unit.seen("a"))
+        self.assertTrue(self.unit.seen("d"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+import json
+import unittest
+
+from amberflo.event_record import EventRecord, to_json_default
+
+
+class TestEventRecord(unittest.TestCase):
+    def test_round_trip(self):
+        cases = [
+            {},
+            {
+                "meterTimeInMillis": 1764355422941,
+                "uniqueId": "chatcmpl-123",
+                "meterApiName": "llm_api_call",
+                "meterValue": 1,
+                "dimensions": {"model": "gpt-4o", "team": "unknown"},
+            },
+            {
+                "meterApiName": "aflo.object_metadata",
+                "meterValue": 1,
+                "meterTimeInMillis": 1764355422941,
+                "dimensions": {"type": "business_unit", "id": "bu", "name": "bu"},
+            },
+        ]
+
+        for case in cases:
+            with self.subTest(case=case):
+                record = EventRecord.from_dict(case)
+                self.assertEqual(record.to_dict(), case)
+
+    def test_json_serialization(self):
+        event = {
+            "meterTimeInMillis": 1000,
+            "uniqueId": "a",
+            "meterApiName": "llm_api_call",
+            "meterValue": 1,
+            "dimensions": {"model": "gpt-4o"},
+        }
+
+        records = [EventRecord.from_dict(event)]
+
+        self.assertEqual(
+            json.dumps(records, default=to_json_default), json.dumps([event])
+        )
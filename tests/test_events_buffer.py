@@ -0,0 +1,303 @@
+import asyncio
+import gzip
+import json
+import unittest
+from typing import cast
+
+from amberflo.event_record import EventRecord
+from amberflo.events_buffer import (
+    CompressedBatch,
+    EventsBuffer,
+    RollupEventsBuffer,
+    StreamingEventsBuffer,
+)
+
+
+def _event(meter, value, time, unique_id, **dimensions):
+    return {
+        "meterTimeInMillis": time,
+        "uniqueId": unique_id,
+        "meterApiName": meter,
+        "meterValue": value,
+        "dimensions": {"model": "gpt-4o", **dimensions},
+    }
+
+
+def _to_dicts(records):
+    return [r.to_dict() for r in records]
+
+
+def _as_list(events):
+    return list(events)
+
+
+def _without_ids(records):
+    return [{**r.to_dict(), "uniqueId": None} for r in records]
+
+
+class TestEventsBuffer(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_events_are_dropped_when_buffer_is_full(self):
+        unit = EventsBuffer(max_buffer_size=2)
+
+        self.loop.run_until_complete(unit.add_events([{}, {}]))
+        size = self.loop.run_until_complete(unit.add_events([{}]))
+
+        self.assertEqual(size, 2)
+
+    def test_oldest_events_are_dropped_when_buffer_is_full(self):
+        unit = EventsBuffer(max_buffer_size=3, overflow="drop-oldest")
+
+        dropped = []
+        unit.on_drop = dropped.extend
+
+        self.loop.run_until_complete(unit.add_events([{"a": 1}, {"b": 2}]))
+        size = self.loop.run_until_complete(unit.add_events([{"c": 3}, {"d": 4}]))
+
+        self.assertEqual(size, 3)
+        self.assertEqual(dropped, [{"a": 1}])
+
+        events, _ = self.loop.run_until_complete(unit.extract_all())
+        self.assertEqual(_as_list(events), [{"b": 2}, {"c": 3}, {"d": 4}])
+
+    def test_adding_waits_for_room_when_buffer_is_full(self):
+        unit = EventsBuffer(max_buffer_size=1, overflow="block", block_timeout=1)
+
+        async def scenario():
+            await unit.add_events([{"a": 1}])
+
+            add = asyncio.create_task(unit.add_events([{"b": 2}]))
+            await asyncio.sleep(0.01)
+            self.assertFalse(add.done())
+
+            first, _ = await unit.extract_all()
+            await add
+            second, _ = await unit.extract_all()
+
+            return first, second
+
+        first, second = self.loop.run_until_complete(scenario())
+
+        self.assertEqual(_as_list(first), [{"a": 1}])
+        self.assertEqual(_as_list(second), [{"b": 2}])
+
+    def test_events_are_dropped_after_waiting_for_room(self):
+        unit = EventsBuffer(max_buffer_size=1, overflow="block", block_timeout=0.01)
+
+        dropped = []
+        unit.on_drop = dropped.extend
+
+        self.loop.run_until_complete(unit.add_events([{"a": 1}]))
+        size = self.loop.run_until_complete(unit.add_events([{"b": 2}]))
+
+        self.assertEqual(size, 1)
+        self.assertEqual(dropped, [{"b": 2}])
+
+    def test_estimated_bytes_are_tracked(self):
+        unit = EventsBuffer(max_buffer_size=2, overflow="drop-oldest")
+        unit.track_bytes = True
+
+        event = _event("llm_api_call", 1, 1764355422941, "a")
+        size = len(json.dumps(event))
+
+        self.loop.run_until_complete(unit.add_events([event, event]))
+        self.loop.run_until_complete(unit.add_events([event]))
+
+        self.assertAlmostEqual(unit.estimated_bytes, 2 * size, delta=2 * size * 0.1)
+
+        estimated_bytes = unit.estimated_bytes
+        self.loop.run_until_complete(unit.extract_all())
+
+        self.assertEqual(unit.estimated_bytes, 0)
+        self.assertEqual(unit.last_batch_bytes, estimated_bytes)
+
+    def test_extract_all_resets_the_buffer(self):
+        unit = EventsBuffer()
+
+        self.loop.run_until_complete(unit.add_events([{}, {}]))
+
+        events, first_time = self.loop.run_until_complete(unit.extract_all())
+        self.assertEqual(len(events), 2)
+        self.assertIsNotNone(first_time)
+
+        events, first_time = self.loop.run_until_complete(unit.extract_all())
+        self.assertEqual(len(events), 0)
+        self.assertIsNone(first_time)
+
+    def test_extract_all_returns_the_buffer_without_copying(self):
+        unit = EventsBuffer()
+
+        self.loop.run_until_complete(unit.add_events([{"a": 1}, {"b": 2}]))
+        buffered = unit.buffer
+
+        events, _ = self.loop.run_until_complete(unit.extract_all())
+
+        self.assertIs(events, buffered)
+        self.assertIsNot(unit.buffer, buffered)
+        self.assertEqual(len(unit.buffer), 0)
+
+    def test_compact_buffer_stores_records(self):
+        unit = EventsBuffer(compact=True)
+
+        event = _event("llm_api_call", 1, 1000, "a")
+
+        self.loop.run_until_complete(unit.add_events([event, dict(event)]))
+
+        batch, _ = self.loop.run_until_complete(unit.extract_all())
+
+        records = cast(list[EventRecord], batch)
+
+        self.assertIsInstance(records[0], EventRecord)
+        self.assertEqual(_to_dicts(records), [event, event])
+
+        # dimensions are shared between the records
+        self.assertIs(records[0].dimensions, records[1].dimensions)
+
+
+class TestRollupEventsBuffer(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_identical_events_are_summed_per_bucket(self):
+        unit = RollupEventsBuffer(granularity=60)
+
+        events = [
+            _event("llm_text_tokens", 10, 60_500, "a", type="in"),
+            _event("llm_text_tokens", 5, 60_500, "a", type="out"),
+            _event("llm_text_tokens", 7, 119_000, "b", type="in"),
+            _event("llm_text_tokens", 3, 120_000, "c", type="in"),
+        ]
+
+        size = self.loop.run_until_complete(unit.add_events(events))
+        self.assertEqual(size, 3)
+
+        rolled_up, _ = self.loop.run_until_complete(unit.extract_all())
+
+        self.assertEqual(
+            _without_ids(rolled_up),
+            [
+                _event("llm_text_tokens", 17, 60_000, None, type="in"),
+                _event("llm_text_tokens", 5, 60_000, None, type="out"),
+                _event("llm_text_tokens", 3, 120_000, None, type="in"),
+            ],
+        )
+
+        # input events are left untouched
+        self.assertEqual(events[0]["meterValue"], 10)
+
+    def test_object_metadata_events_are_collapsed(self):
+        unit = RollupEventsBuffer()
+
+        metadata = {
+            "meterApiName": "aflo.object_metadata",
+            "meterValue": 1,
+            "meterTimeInMillis": 1000,
+            "dimensions": {"type": "business_unit", "id": "bu", "name": "bu"},
+        }
+
+        self.loop.run_until_complete(unit.add_events([metadata, dict(metadata)]))
+
+        rolled_up, _ = self.loop.run_until_complete(unit.extract_all())
+
+        self.assertEqual(_to_dicts(rolled_up), [{**metadata, "meterTimeInMillis": 0}])
+
+    def test_extract_all_resets_the_aggregates(self):
+        unit = RollupEventsBuffer()
+
+        event = _event("llm_api_call", 1, 1000, "a")
+
+        self.loop.run_until_complete(unit.add_events([event]))
+        self.loop.run_until_complete(unit.extract_all())
+
+        self.loop.run_until_complete(unit.add_events([event]))
+        rolled_up, _ = self.loop.run_until_complete(unit.extract_all())
+
+        self.assertEqual(
+            _without_ids(rolled_up),
+            [{**event, "meterTimeInMillis": 0, "uniqueId": None}],
+        )
+
+    def test_aggregates_have_ids_of_their_own(self):
+        unit = RollupEventsBuffer()
+
+        first = _event("llm_api_call", 1, 1000, "x")
+        second = _event("llm_api_call", 1, 1000, "y")
+
+        self.loop.run_until_complete(unit.add_events([first]))
+        flushed, _ = self.loop.run_until_complete(unit.extract_all())
+
+        # the same request again, then another one, in the same bucket
+        self.loop.run_until_complete(unit.add_events([first, second]))
+        rolled_up, _ = self.loop.run_until_complete(unit.extract_all())
+
+        # the same request in another worker
+        other = RollupEventsBuffer()
+        self.loop.run_until_complete(other.add_events([first]))
+        elsewhere, _ = self.loop.run_until_complete(other.extract_all())
+
+        ids = [
+            e.unique_id
+            for e in cast(list, flushed) + cast(list, rolled_up) + cast(list, elsewhere)
+        ]
+
+        self.assertEqual(len(set(ids)), 3)
+        self.assertNotIn("x", ids)
+        self.assertNotIn("y", ids)
+
+
+class TestStreamingEventsBuffer(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_events_are_compressed_as_they_are_added(self):
+        unit = StreamingEventsBuffer()
+
+        events = [
+            _event("llm_api_call", 1, 1000, "a"),
+            _event("llm_api_call", 1, 2000, "b"),
+            _event("llm_api_call_ms", 300, 2000, "b"),
+        ]
+
+        self.loop.run_until_complete(unit.add_events(events[:1]))
+        size = self.loop.run_until_complete(unit.add_events(events[1:]))
+        self.assertEqual(size, 3)
+
+        batch, first_time = self.loop.run_until_complete(unit.extract_all())
+
+        self.assertIsInstance(batch, CompressedBatch)
+        self.assertEqual(len(batch), 3)
+        self.assertIsNotNone(first_time)
+
+        body = batch.body  # type: ignore
+        self.assertEqual(json.loads(gzip.decompress(body)), events)
+
+    def test_extract_all_starts_a_new_stream(self):
+        unit = StreamingEventsBuffer()
+
+        event = _event("llm_api_call", 1, 1000, "a")
+
+        self.loop.run_until_complete(unit.add_events([event]))
+        self.loop.run_until_complete(unit.extract_all())
+
+        batch, _ = self.loop.run_until_complete(unit.extract_all())
+        self.assertEqual(len(batch), 0)
+
+        self.loop.run_until_complete(unit.add_events([event]))
+        batch, _ = self.loop.run_until_complete(unit.extract_all())
+
+        body = batch.body  # type: ignore
+        self.assertEqual(json.loads(gzip.decompress(body)), [event])
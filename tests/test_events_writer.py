@@ -1,4 +1,7 @@
 import asyncio
+import gzip
+import json
+import tempfile
 import unittest
 from asyncio.exceptions import CancelledError
 from typing import cast
@@ -6,8 +9,10 @@ from datetime import datetime
 
 from amberflo.blob_client import BlobWriter
 from amberflo.events_writer import AsyncEventsWriter
+from amberflo.spill_store import SpillStore
+from amberflo.upload_scheduler import UploadScheduler
 from amberflo.utils import make_key
-from amberflo.events_buffer import EventsBuffer
+from amberflo.events_buffer import EventsBuffer, StreamingEventsBuffer
 
 
 class DummyWriter(BlobWriter):
@@ -21,6 +26,21 @@ class DummyWriter(BlobWriter):
         return make_key(timestamp, "path")
 
 
+class FailingWriter(DummyWriter):
+    async def put_object(self, key: str, body: bytes) -> None:
+        raise RuntimeError("boom!")
+
+
+class SlowWriter(DummyWriter):
+    def __init__(self):
+        super().__init__()
+        self.release = asyncio.Event()
+
+    async def put_object(self, key: str, body: bytes) -> None:
+        await self.release.wait()
+        await super().put_object(key, body)
+
+
 class TestEventsWriter(unittest.TestCase):
     def setUp(self):
         self.loop = asyncio.new_event_loop()
@@ -92,3 +112,256 @@ class TestEventsWriter(unittest.TestCase):
             self.loop.run_until_complete(task)
 
         self.assertEqual(len(dummy.items), 0)
+
+    def test_events_are_serialized_off_the_event_loop(self):
+        for serializer in ("thread", "process"):
+            with self.subTest(serializer=serializer):
+                dummy = DummyWriter()
+                unit = AsyncEventsWriter(
+                    dummy, EventsBuffer(), batch_size=2, serializer=serializer
+                )
+
+                self.loop.run_until_complete(unit.async_write([{"a": 1}, {"b": 2}]))
+
+                self.assertEqual(len(dummy.items), 1)
+
+                _, body = dummy.items[0]
+                self.assertEqual(
+                    json.loads(gzip.decompress(body)), [{"a": 1}, {"b": 2}]
+                )
+
+                unit.executor.shutdown()
+
+    def test_compressed_batches_are_written_as_is(self):
+        dummy = DummyWriter()
+        unit = AsyncEventsWriter(dummy, StreamingEventsBuffer(), batch_size=2)
+
+        self.loop.run_until_complete(unit.async_write([{"a": 1}]))
+        self.loop.run_until_complete(unit.async_write([{"b": 2}]))
+
+        self.assertEqual(len(dummy.items), 1)
+
+        _, body = dummy.items[0]
+        self.assertEqual(json.loads(gzip.decompress(body)), [{"a": 1}, {"b": 2}])
+
+    def test_shutdown_flushes_and_waits_for_uploads(self):
+        dummy = DummyWriter()
+        unit = AsyncEventsWriter(dummy, EventsBuffer())
+
+        self.loop.run_until_complete(unit.async_write([{}]))
+
+        completed = self.loop.run_until_complete(unit.shutdown(1))
+
+        self.assertTrue(completed)
+        self.assertEqual(len(dummy.items), 1)
+        self.assertIsNone(unit.flush_task)
+
+    def test_shutdown_does_not_interrupt_a_flush(self):
+        slow = SlowWriter()
+        unit = AsyncEventsWriter(slow, EventsBuffer())
+        unit.uploads = UploadScheduler(slow, max_in_flight=1, max_pending=1)
+        setattr(unit.flush_scheduler, "next_delay", lambda *_: 0.01)
+
+        async def run():
+            # fill up the uploads, so that the periodic flush waits for room
+            await unit.uploads.submit("first", b"body")
+            await unit.uploads.submit("second", b"body")
+
+            await unit.async_write([{"a": 1}, {"b": 2}])
+            await asyncio.sleep(0.1)
+
+            shutdown = asyncio.ensure_future(unit.shutdown(5))
+            await asyncio.sleep(0.1)
+
+            slow.release.set()
+            return await shutdown
+
+        self.assertTrue(self.loop.run_until_complete(run()))
+        self.assertEqual(len(slow.items), 3)
+
+        _, body = slow.items[2]
+        self.assertEqual(json.loads(gzip.decompress(body)), [{"a": 1}, {"b": 2}])
+
+    def test_adaptive_flush_sees_events_added_while_sleeping(self):
+        dummy = DummyWriter()
+        unit = AsyncEventsWriter(dummy, EventsBuffer())
+        unit.flush_scheduler.adaptive = True
+        setattr(unit.flush_scheduler, "next_delay", lambda *_: 0.05)
+
+        async def run():
+            await unit.async_init()
+            await asyncio.sleep(0.01)
+
+            # the flush task sleeps, having seen an empty buffer
+            await unit.buffer.add_events([{"a": 1}])
+            await asyncio.sleep(0.07)
+
+        self.loop.run_until_complete(run())
+
+        self.assertEqual(len(dummy.items), 1)
+
+    def test_events_are_kept_until_the_backend_is_ready(self):
+        dummy = DummyWriter()
+        backend_ready = [False]
+
+        async def ready():
+            return backend_ready[0]
+
+        setattr(dummy, "ready", ready)
+        unit = AsyncEventsWriter(dummy, EventsBuffer(), batch_size=1)
+
+        # ask again right away
+        unit.flush_scheduler.min_interval = 0
+
+        self.loop.run_until_complete(unit.async_write([{"a": 1}]))
+
+        self.assertEqual(dummy.items, [])
+        self.assertEqual(unit.buffer.size, 1)
+
+        backend_ready[0] = True
+        self.loop.run_until_complete(unit.async_write([{"b": 2}]))
+
+        _, body = dummy.items[0]
+        self.assertEqual(json.loads(gzip.decompress(body)), [{"a": 1}, {"b": 2}])
+
+        self.loop.run_until_complete(unit.shutdown(1))
+
+    def test_flushes_back_off_while_the_backend_is_not_ready(self):
+        dummy = DummyWriter()
+        attempts = [0]
+
+        async def ready():
+            attempts[0] += 1
+            return False
+
+        setattr(dummy, "ready", ready)
+        unit = AsyncEventsWriter(dummy, EventsBuffer(), batch_size=1)
+        unit.flush_scheduler.min_interval = 0.1
+
+        # e.g. a timer for events older than the flush interval
+        setattr(unit.flush_scheduler, "next_delay", lambda *_: 0)
+
+        async def run():
+            await unit.async_write([{"a": 1}])
+            await asyncio.sleep(0.25)
+
+            for _ in range(100):
+                await unit.async_write([{"b": 2}])
+
+        self.loop.run_until_complete(run())
+
+        self.assertLessEqual(attempts[0], 3)
+        self.assertEqual(unit.buffer.size, 101)
+
+        self.loop.run_until_complete(unit.shutdown(1))
+
+    def test_events_are_spilled_at_shutdown_if_the_backend_is_not_ready(self):
+        with tempfile.TemporaryDirectory() as directory:
+            spill = SpillStore(directory)
+            dummy = DummyWriter()
+
+            async def ready():
+                return False
+
+            setattr(dummy, "ready", ready)
+            unit = AsyncEventsWriter(dummy, EventsBuffer(), spill=spill)
+
+            async def run():
+                await unit.async_write([{"a": 1}])
+                await unit.shutdown(1)
+
+            self.loop.run_until_complete(run())
+
+            (segment,) = spill.segments()
+            body = segment.read_bytes().split(b"\n", 1)[1]
+            self.assertEqual(json.loads(gzip.decompress(body)), [{"a": 1}])
+
+    def test_queued_writes_are_merged_and_flushed(self):
+        dummy = DummyWriter()
+        unit = AsyncEventsWriter(dummy, EventsBuffer(), batch_size=4, queue_size=10)
+
+        async def write():
+            for i in range(5):
+                unit.write_nowait([{"i": i}])
+            return await unit.shutdown(1)
+
+        completed = self.loop.run_until_complete(write())
+
+        self.assertTrue(completed)
+        self.assertIsNone(unit.ingest_task)
+
+        bodies = [json.loads(gzip.decompress(body)) for _, body in dummy.items]
+        self.assertEqual(bodies, [[{"i": i} for i in range(4)], [{"i": 4}]])
+
+    def test_queued_writes_are_dropped_when_the_queue_is_full(self):
+        dropped = []
+        buffer = EventsBuffer()
+        buffer.on_drop = dropped.extend
+        unit = AsyncEventsWriter(DummyWriter(), buffer, queue_size=1)
+
+        async def write():
+            unit.write_nowait([{"a": 1}])
+            unit.write_nowait([{"b": 2}])
+            await unit.shutdown(1)
+
+        self.loop.run_until_complete(write())
+
+        self.assertEqual(dropped, [{"b": 2}])
+
+    def test_failed_and_dropped_events_are_spilled(self):
+        with tempfile.TemporaryDirectory() as directory:
+            spill = SpillStore(directory)
+
+            unit = AsyncEventsWriter(
+                FailingWriter(), EventsBuffer(max_buffer_size=2), spill=spill
+            )
+
+            # the third event does not fit in the buffer
+            self.loop.run_until_complete(unit.async_write([{"a": 1}, {"b": 2}]))
+            self.loop.run_until_complete(unit.async_write([{"c": 3}]))
+
+            self.loop.run_until_complete(unit.shutdown(1))
+
+            bodies = [p.read_bytes().split(b"\n", 1)[1] for p in spill.segments()]
+
+            self.assertEqual(
+                sorted((json.loads(gzip.decompress(b)) for b in bodies), key=len),
+                [[{"c": 3}], [{"a": 1}, {"b": 2}]],
+            )
+
+    def test_spilled_batches_are_replayed_from_startup(self):
+        with tempfile.TemporaryDirectory() as directory:
+            spill = SpillStore(directory)
+            spill.save("key", b"body")
+
+            dummy = DummyWriter()
+
+            async def run():
+                # built on the event loop, without any write
+                unit = AsyncEventsWriter(dummy, EventsBuffer(), spill=spill)
+                await asyncio.sleep(0.1)
+                await unit.shutdown(1)
+
+            self.loop.run_until_complete(run())
+
+            self.assertEqual(dummy.items, [("key", b"body")])
+
+    def test_events_are_written_when_target_object_size_is_reached(self):
+        dummy = DummyWriter()
+        buffer = EventsBuffer()
+        unit = AsyncEventsWriter(dummy, buffer, batch_size=100, target_object_bytes=20)
+
+        self.assertTrue(buffer.track_bytes)
+
+        # each event is estimated at more than 100 bytes, and the initial
+        # compression ratio is 0.1
+        self.loop.run_until_complete(unit.async_write([{}]))
+
+        self.assertEqual(len(dummy.items), 0)
+
+        self.loop.run_until_complete(unit.async_write([{}]))
+
+        self.assertEqual(len(dummy.items), 1)
+
+        # the ratio is adjusted from the actual size of the body
+        self.assertNotEqual(unit.compression_ratio, 0.1)
@@ -0,0 +1,126 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+from amberflo import metrics
+from amberflo.blob_client import BlobWriter
+from amberflo.events_buffer import EventsBuffer
+from amberflo.events_writer import AsyncEventsWriter
+from amberflo.fan_out_writer import FanOutWriter
+from amberflo.utils import make_key
+
+
+class PathWriter(BlobWriter):
+    def __init__(self, path):
+        self.path = path
+        self.name = path
+        self.items = []
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def put_object(self, key: str, body: bytes) -> None:
+        await self.release.wait()
+        if self.path == "failing":
+            raise RuntimeError("boom!")
+        self.items.append((key, body))
+
+    def make_key(self, timestamp: datetime) -> str:
+        return make_key(timestamp, self.path)
+
+    async def warm_up(self) -> None:
+        pass
+
+
+_timestamp = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+class TestFanOutWriter(unittest.IsolatedAsyncioTestCase):
+    async def test_blobs_are_written_to_each_sink_under_its_key(self):
+        sinks = [PathWriter("one"), PathWriter("two")]
+        unit = FanOutWriter(sinks)
+
+        key = unit.make_key(_timestamp)
+        await unit.put_object(key, b"body")
+        self.assertTrue(await unit.drain(1))
+
+        self.assertEqual(sinks[0].items, [(key, b"body")])
+        self.assertEqual(len(sinks[1].items), 1)
+
+        other_key, body = sinks[1].items[0]
+        self.assertTrue(other_key.startswith("two/2025/01/01/00/00/"))
+        self.assertIs(body, sinks[0].items[0][1])
+
+    async def test_failing_sink_does_not_affect_the_others(self):
+        sinks = [PathWriter("failing"), PathWriter("working")]
+        unit = FanOutWriter(sinks)
+
+        failed = metrics.uploads_failed.value(backend="failing")
+
+        await unit.put_object(unit.make_key(_timestamp), b"body")
+        self.assertTrue(await unit.drain(1))
+
+        self.assertEqual(len(sinks[1].items), 1)
+        self.assertEqual(metrics.uploads_failed.value(backend="failing"), failed + 1)
+
+    async def test_slow_sink_does_not_hold_up_the_others(self):
+        sinks = [PathWriter("slow"), PathWriter("fast")]
+        sinks[0].release.clear()
+
+        unit = FanOutWriter(sinks)
+        slow = unit.uploads[0]
+        slow_capacity = slow.max_in_flight + slow.max_pending
+
+        for i in range(slow_capacity + 2):
+            await asyncio.wait_for(unit.put_object(f"key-{i}", b"body"), 1)
+            await asyncio.sleep(0)
+
+        self.assertTrue(await unit.uploads[1].drain(1))
+        self.assertEqual(len(sinks[1].items), slow_capacity + 2)
+
+        sinks[0].release.set()
+        self.assertTrue(await unit.drain(1))
+        self.assertEqual(len(sinks[0].items), slow_capacity)
+
+    async def test_failed_and_skipped_uploads_are_spilled_per_sink(self):
+        with (
+            tempfile.TemporaryDirectory() as directory,
+            patch.dict(os.environ, {"AFLO_SPILL_DIR": directory}),
+        ):
+            sinks = [PathWriter("failing"), PathWriter("slow"), PathWriter("fast")]
+            sinks[1].release.clear()
+
+            unit = FanOutWriter(sinks, spill=True)
+            slow = unit.uploads[1]
+            slow_capacity = slow.max_in_flight + slow.max_pending
+
+            for i in range(slow_capacity + 1):
+                await unit.put_object(f"key-{i}", b"body")
+                await asyncio.sleep(0)
+
+            sinks[1].release.set()
+            self.assertTrue(await unit.drain(1))
+
+            failing, slow, fast = unit.spills
+            assert failing and slow and fast
+
+            self.assertEqual(len(failing.segments()), slow_capacity + 1)
+            self.assertEqual(len(slow.segments()), 1)
+            self.assertEqual(fast.segments(), [])
+
+            # replayed to that sink only
+            self.assertEqual(await slow.replay(sinks[1]), 1)
+            self.assertEqual(len(sinks[1].items), slow_capacity + 1)
+            self.assertEqual(len(sinks[2].items), slow_capacity + 1)
+
+    async def test_events_writer_waits_for_the_uploads_to_each_sink(self):
+        sinks = [PathWriter("one"), PathWriter("two")]
+        writer = AsyncEventsWriter(FanOutWriter(sinks), EventsBuffer())
+
+        await writer.async_write([{"a": 1}])
+        self.assertTrue(await writer.shutdown(1))
+
+        self.assertEqual(len(sinks[0].items), 1)
+        self.assertEqual(len(sinks[1].items), 1)
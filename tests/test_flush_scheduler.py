@@ -0,0 +1,89 @@
+import unittest
+
+from amberflo.flush_scheduler import FlushScheduler
+
+
+class TestFlushScheduler(unittest.TestCase):
+    def setUp(self):
+        self.now = 0.0
+
+    def _scheduler(self, **kwargs):
+        return FlushScheduler(
+            batch_size=100,
+            max_delay=60,
+            max_events=5000,
+            clock=lambda: self.now,
+            **kwargs,
+        )
+
+    def _arrive(self, unit, rate, seconds):
+        for _ in range(seconds):
+            self.now += 1
+            unit.observe(rate)
+
+    def test_fixed_interval_with_jitter(self):
+        unit = self._scheduler(jitter=0.1)
+
+        delays = [unit.next_delay(10, 5) for _ in range(100)]
+
+        self.assertTrue(all(54 <= d <= 60 for d in delays))
+        self.assertGreater(len(set(delays)), 1)
+        self.assertEqual(unit.target_events, 100)
+
+    def test_rate_is_estimated(self):
+        unit = self._scheduler(adaptive=True)
+
+        self._arrive(unit, 50, 10)
+
+        self.assertAlmostEqual(unit.rate or 0, 50)
+
+    def test_target_grows_with_the_rate(self):
+        unit = self._scheduler(adaptive=True, min_interval=2)
+
+        self._arrive(unit, 10, 5)
+        self.assertEqual(unit.target_events, 100)
+
+        self._arrive(unit, 1000, 20)
+        self.assertAlmostEqual(unit.target_events, 2000, delta=10)
+
+        self._arrive(unit, 100000, 20)
+        self.assertEqual(unit.target_events, 5000)
+
+    def test_quiet_worker_waits_for_the_max_delay(self):
+        unit = self._scheduler(adaptive=True, jitter=0)
+
+        self._arrive(unit, 1, 5)
+
+        # the buffer would take 95 seconds to fill up
+        self.assertAlmostEqual(unit.next_delay(5, 10), 50)
+
+    def test_busy_worker_flushes_at_the_target(self):
+        unit = self._scheduler(adaptive=True, jitter=0, min_interval=1)
+
+        self._arrive(unit, 50, 5)
+
+        self.assertAlmostEqual(unit.next_delay(50, 1), 1)
+        self.assertAlmostEqual(unit.next_delay(0, 0), 1)
+
+    def test_max_delay_holds(self):
+        unit = self._scheduler(adaptive=True, jitter=0.5)
+
+        self._arrive(unit, 1, 5)
+
+        self.assertTrue(all(unit.next_delay(5, 59.5) <= 0.5 for _ in range(100)))
+
+    def test_overdue_events_do_not_make_the_timer_spin(self):
+        unit = self._scheduler(adaptive=True, jitter=0.5, min_interval=2)
+
+        self._arrive(unit, 50, 5)
+
+        # e.g. the last flush left the events behind
+        self.assertEqual(unit.next_delay(5, 61), 2)
+
+        unit.min_interval = 0
+        self.assertEqual(unit.next_delay(5, 61), unit.min_delay)
+        self.assertGreaterEqual(unit.next_delay(5, 59.99), unit.min_delay)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,10 @@
-import unittest
+import json
 import logging
+import queue
+import sys
+import unittest
 
-from amberflo.logging import get_logger
+from amberflo.logging import JsonFormatter, RateLimitFilter, _QueueHandler, get_logger
 
 
 # TODO actually assert on the contents of stderr
@@ -31,3 +34,76 @@ class TestLogging(unittest.TestCase):
             raise Exception("boom!")
         except Exception:
             logger.exception("hello4")
+
+
+class TestLoggingSetUp(unittest.TestCase):
+    def test_get_logger_is_idempotent(self):
+        get_logger("logger5")
+        logger = get_logger("logger5")
+
+        self.assertEqual(len(logger.handlers), 1)
+        self.assertEqual(len(logger.filters), 1)
+
+    def test_queue_handler_keeps_the_traceback_apart(self):
+        handler = _QueueHandler(queue.SimpleQueue())
+
+        try:
+            raise Exception("boom!")
+        except Exception:
+            record = logging.LogRecord(
+                "logger6",
+                logging.ERROR,
+                __file__,
+                1,
+                "hello %s",
+                ("6",),
+                sys.exc_info(),
+            )
+
+        prepared = handler.prepare(record)
+        formatted = json.loads(JsonFormatter().format(prepared))
+
+        self.assertEqual(formatted["msg"], "hello 6")
+        self.assertIn("Exception: boom!", formatted["exception"])
+
+
+class TestRateLimitFilter(unittest.TestCase):
+    def _record(self, level, msg, *args):
+        return logging.LogRecord("logger7", level, __file__, 1, msg, args, None)
+
+    def test_repeated_warnings_are_rate_limited(self):
+        now = [0.0]
+        unit = RateLimitFilter(10, clock=lambda: now[0])
+
+        def warn(n):
+            return unit.filter(self._record(logging.WARNING, "Dropping %s events", n))
+
+        self.assertTrue(warn(1))
+        self.assertFalse(warn(2))
+        self.assertFalse(warn(3))
+
+        # other messages and levels are not affected
+        self.assertTrue(unit.filter(self._record(logging.WARNING, "Other")))
+        self.assertTrue(
+            unit.filter(self._record(logging.INFO, "Dropping %s events", 4))
+        )
+
+        now[0] = 10
+        record = self._record(logging.WARNING, "Dropping %s events", 5)
+
+        self.assertTrue(unit.filter(record))
+        self.assertEqual(
+            record.getMessage(), "Dropping 5 events (2 similar messages suppressed)"
+        )
+
+    def test_templates_are_bounded(self):
+        unit = RateLimitFilter(10, clock=lambda: 0.0, max_templates=2)
+
+        passed = [
+            unit.filter(self._record(logging.WARNING, msg))
+            for msg in ("first", "second", "first", "third")
+        ]
+
+        self.assertEqual(passed, [True, True, False, True])
+
+        self.assertEqual(list(unit._seen), ["first", "third"])
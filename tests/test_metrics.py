@@ -0,0 +1,117 @@
+import asyncio
+import unittest
+import urllib.request
+
+from amberflo import metrics
+from amberflo.events_buffer import EventsBuffer
+from amberflo.events_writer import AsyncEventsWriter
+from amberflo.metrics import PrometheusExporter, Registry, render_prometheus
+
+from .test_events_writer import DummyWriter, FailingWriter
+
+
+class TestMetrics(unittest.TestCase):
+    def test_counter_and_gauge(self):
+        registry = Registry()
+        counter = registry.counter("requests_total", "Requests")
+        gauge = registry.gauge("queue", "Queue size")
+
+        counter.inc()
+        counter.inc(2, code="500")
+        counter.inc(3, code="500")
+        gauge.set(5)
+        gauge.dec()
+
+        self.assertEqual(counter.value(), 1)
+        self.assertEqual(counter.value(code="500"), 5)
+        self.assertEqual(gauge.value(), 4)
+        self.assertIs(registry.counter("requests_total", "Requests"), counter)
+
+        with self.assertRaises(ValueError):
+            registry.gauge("requests_total", "Requests")
+
+    def test_render_prometheus(self):
+        registry = Registry()
+        registry.counter("events_total", "Events").inc(3, reason='a "b"')
+        histogram = registry.histogram("duration_seconds", "Duration", buckets=(1, 5))
+
+        histogram.observe(0.5)
+        histogram.observe(2)
+        histogram.observe(10)
+
+        self.assertEqual(
+            render_prometheus(registry),
+            "\n".join(
+                [
+                    "# HELP events_total Events",
+                    "# TYPE events_total counter",
+                    'events_total{reason="a \\"b\\""} 3',
+                    "# HELP duration_seconds Duration",
+                    "# TYPE duration_seconds histogram",
+                    'duration_seconds_bucket{le="1.0"} 1',
+                    'duration_seconds_bucket{le="5.0"} 2',
+                    'duration_seconds_bucket{le="+Inf"} 3',
+                    "duration_seconds_sum 12.5",
+                    "duration_seconds_count 3",
+                    "",
+                ]
+            ),
+        )
+
+    def test_prometheus_exporter_serves_metrics(self):
+        registry = Registry()
+        registry.gauge("up", "Up").set(1)
+
+        exporter = PrometheusExporter(port=0, host="127.0.0.1")
+        exporter.start(registry)
+
+        try:
+            url = f"http://127.0.0.1:{exporter.port}/metrics"
+            with urllib.request.urlopen(url, timeout=5) as response:
+                body = response.read().decode()
+        finally:
+            exporter.close()
+
+        self.assertIn("up 1", body)
+
+    def test_pipeline_is_instrumented(self):
+        loop = asyncio.new_event_loop()
+
+        received = metrics.events_received.value()
+        flushed = metrics.events_flushed.value()
+        dropped = metrics.events_dropped.value(reason="buffer_full")
+        uploads = metrics.upload_seconds.count(backend="DummyWriter")
+        failures = metrics.uploads_failed.value(backend="FailingWriter")
+        metrics.compression_ratio.set(0)
+
+        async def write(client):
+            unit = AsyncEventsWriter(client, EventsBuffer(max_buffer_size=2))
+            await unit.async_write([{"a": 1}, {"b": 2}, {"c": 3}])
+            await unit.async_write([{"d": 4}])
+            await unit.shutdown(1)
+
+        try:
+            loop.run_until_complete(write(DummyWriter()))
+            loop.run_until_complete(write(FailingWriter()))
+        finally:
+            loop.close()
+
+        self.assertEqual(metrics.events_received.value() - received, 8)
+        self.assertEqual(metrics.events_flushed.value() - flushed, 2)
+        self.assertEqual(
+            metrics.events_dropped.value(reason="buffer_full") - dropped, 6
+        )
+        self.assertEqual(
+            metrics.upload_seconds.count(backend="DummyWriter") - uploads, 1
+        )
+        self.assertEqual(
+            metrics.uploads_failed.value(backend="FailingWriter") - failures, 1
+        )
+        self.assertEqual(metrics.uploads_in_flight.value(backend="DummyWriter"), 0)
+
+        # without tracking the size of the buffered events
+        self.assertGreater(metrics.compression_ratio.value(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
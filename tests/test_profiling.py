@@ -0,0 +1,59 @@
+import asyncio
+import time
+import unittest
+
+from amberflo import metrics
+from amberflo.profiling import LoopLagMonitor, timed
+
+
+class TestProfiling(unittest.TestCase):
+    def test_timed_records_stages(self):
+        @timed("test.sync", enabled=True, threshold=0.01)
+        def slow():
+            time.sleep(0.02)
+            return 1
+
+        with self.assertLogs("amberflo.profiling", "WARNING") as logs:
+            self.assertEqual(slow(), 1)
+
+        self.assertIn("Slow stage test.sync", logs.output[0])
+        self.assertEqual(metrics.stage_seconds.count(stage="test.sync"), 1)
+        self.assertGreaterEqual(metrics.stage_seconds.sum(stage="test.sync"), 0.02)
+
+    def test_timed_rejects_coroutine_functions(self):
+        async def fn():
+            pass
+
+        # even when disabled, so that it does not fail once enabled
+        with self.assertRaises(TypeError):
+            timed("test.async", enabled=False)(fn)
+
+    def test_timed_is_a_no_op_when_disabled(self):
+        def fn():
+            pass
+
+        self.assertIs(timed("test.disabled", enabled=False)(fn), fn)
+
+    def test_loop_lag_monitor_warns(self):
+        monitor = LoopLagMonitor(interval=0.01, threshold=0.02)
+        count = metrics.loop_lag_seconds.count()
+
+        async def run():
+            task = asyncio.create_task(monitor.run())
+            await asyncio.sleep(0)
+
+            # block the loop
+            time.sleep(0.05)
+            await asyncio.sleep(0.02)
+
+            task.cancel()
+
+        with self.assertLogs("amberflo.profiling", "WARNING") as logs:
+            asyncio.run(run())
+
+        self.assertIn("Event loop lagging", logs.output[0])
+        self.assertGreater(metrics.loop_lag_seconds.count(), count)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+
+from botocore.stub import Stubber
+
+from amberflo.s3_client import S3Client
+
+
+class TestS3Client(unittest.IsolatedAsyncioTestCase):
+    """
+    Test class for the S3Client.
+    """
+
+    def setUp(self):
+        self.client = S3Client(
+            aws_access_key_id="test",
+            aws_secret_access_key="test",
+            region_name="us-east-1",
+            bucket="bucket",
+            path="path",
+            endpoint_url="http://localhost:9000",
+            max_connections=3,
+        )
+
+    def tearDown(self):
+        self.client.executor.shutdown()
+
+    def test_connection_pool_is_sized(self):
+        self.assertEqual(self.client.s3.meta.config.max_pool_connections, 3)
+        self.assertEqual(self.client.s3.meta.endpoint_url, "http://localhost:9000")
+
+    async def test_put_object(self):
+        data = b"body"
+
+        with Stubber(self.client.s3) as stubber:
+            stubber.add_response(
+                "put_object",
+                {},
+                {
+                    "Bucket": "bucket",
+                    "Key": "key-123",
+                    "Body": data,
+                    "ContentType": "application/json",
+                    "ContentEncoding": "gzip",
+                },
+            )
+
+            await self.client.put_object("key-123", data)
+
+            stubber.assert_no_pending_responses()
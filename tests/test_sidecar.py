@@ -0,0 +1,93 @@
+import asyncio
+import gzip
+import json
+import os
+import tempfile
+import unittest
+
+from amberflo.callback import Callback
+from amberflo.events_buffer import EventsBuffer
+from amberflo.events_writer import AsyncEventsWriter
+from amberflo.sidecar import SidecarEventsWriter, SidecarServer
+from amberflo.transformer import extract_events_from_log
+
+from .test_events_writer import DummyWriter
+from .test_transformer import _load_log
+
+
+class TestSidecar(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "aflo.sock")
+
+    def tearDown(self):
+        self.loop.close()
+        self.directory.cleanup()
+
+    def test_events_are_forwarded_to_the_sidecar(self):
+        dummy = DummyWriter()
+        server = SidecarServer(AsyncEventsWriter(dummy, EventsBuffer()), self.path)
+        workers = [SidecarEventsWriter(self.path, batch_size=2) for _ in range(2)]
+
+        async def run():
+            await server.start()
+
+            for i, worker in enumerate(workers):
+                worker.write_nowait([{"worker": i, "n": 1}])
+                worker.write_nowait([{"worker": i, "n": 2}, {"worker": i, "n": 3}])
+
+            sent = [await worker.shutdown(1) for worker in workers]
+
+            # let the sidecar read what was sent
+            await asyncio.sleep(0.1)
+
+            return sent, await server.stop(1)
+
+        sent, completed = self.loop.run_until_complete(run())
+
+        self.assertEqual(sent, [True, True])
+        self.assertTrue(completed)
+        self.assertFalse(os.path.exists(self.path))
+
+        events = [
+            e for _, body in dummy.items for e in json.loads(gzip.decompress(body))
+        ]
+        self.assertEqual(
+            sorted(events, key=lambda e: (e["worker"], e["n"])),
+            [{"worker": w, "n": n} for w in range(2) for n in range(1, 4)],
+        )
+
+    def test_events_are_kept_while_the_sidecar_is_down(self):
+        worker = SidecarEventsWriter(self.path, max_pending=2)
+
+        async def run():
+            worker.write_nowait([{"a": 1}])
+            worker.write_nowait([{"b": 2}, {"c": 3}])
+            await asyncio.sleep(0)
+            return await worker.shutdown(1)
+
+        sent = self.loop.run_until_complete(run())
+
+        self.assertFalse(sent)
+        self.assertEqual(worker._pending, [{"a": 1}])
+
+    def test_callback_hands_the_events_over_without_a_task(self):
+        worker = SidecarEventsWriter(self.path, max_pending=0)
+        callback = Callback(worker)
+        log = _load_log("openai-gpt-4o.completion")
+
+        async def run():
+            await callback({"standard_logging_object": log})
+            self.assertEqual(callback._tasks, set())
+            await worker.shutdown(0.1)
+
+        self.loop.run_until_complete(run())
+
+        # no limit, and the sidecar is down
+        self.assertEqual(worker._pending, extract_events_from_log(log))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime
+
+from amberflo.blob_client import BlobWriter
+from amberflo.spill_store import SpillStore
+from amberflo.utils import make_key
+
+
+class FlakyWriter(BlobWriter):
+    def __init__(self, failures=0):
+        self.items = []
+        self.failures = failures
+
+    async def put_object(self, key: str, body: bytes) -> None:
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("boom!")
+        self.items.append((key, body))
+
+    def make_key(self, timestamp: datetime) -> str:
+        return make_key(timestamp, "path")
+
+
+class TestSpillStore(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    async def test_spilled_batches_are_replayed_in_order(self):
+        unit = SpillStore(self.directory.name)
+
+        await unit.spill("key-1", b"body-1")
+        await unit.spill("key-2", b"body\n2")
+
+        # e.g. after a restart
+        unit = SpillStore(self.directory.name, replay_concurrency=1)
+
+        writer = FlakyWriter()
+        replayed = await unit.replay(writer)
+
+        self.assertEqual(replayed, 2)
+        self.assertEqual(writer.items, [("key-1", b"body-1"), ("key-2", b"body\n2")])
+        self.assertEqual(unit.segments(), [])
+
+    async def test_failed_batches_are_kept(self):
+        unit = SpillStore(self.directory.name, replay_concurrency=1)
+
+        await unit.spill("key-1", b"body-1")
+        await unit.spill("key-2", b"body-2")
+
+        writer = FlakyWriter(failures=1)
+
+        self.assertEqual(await unit.replay(writer), 0)
+        self.assertEqual(len(unit.segments()), 2)
+
+        self.assertEqual(await unit.replay(writer), 2)
+        self.assertEqual(len(unit.segments()), 0)
+
+    async def test_batches_are_dropped_when_full(self):
+        unit = SpillStore(self.directory.name, max_bytes=15)
+
+        await unit.spill("key-1", b"body-1")
+        await unit.spill("key-2", b"body-2")
+
+        self.assertEqual(len(unit.segments()), 1)
+
+    async def test_segments_claimed_by_another_worker_are_skipped(self):
+        unit = SpillStore(self.directory.name, replay_concurrency=1)
+
+        await unit.spill("key-1", b"body-1")
+        await unit.spill("key-2", b"body-2")
+
+        # claimed by another worker
+        first = unit.segments()[0]
+        first.rename(first.with_suffix(".replaying"))
+
+        writer = FlakyWriter()
+
+        self.assertEqual(await unit.replay(writer), 1)
+        self.assertEqual(writer.items, [("key-2", b"body-2")])
+
+    async def test_stale_claims_and_partial_segments_are_recovered(self):
+        unit = SpillStore(self.directory.name)
+
+        await unit.spill("key-1", b"body-1")
+
+        segment = unit.segments()[0]
+        claimed = segment.with_suffix(".replaying")
+        segment.rename(claimed)
+
+        partial = segment.with_suffix(".tmp")
+        partial.write_bytes(b"key-2\nbo")
+
+        # recent ones may belong to a live worker
+        unit.recover()
+        self.assertEqual(unit.segments(), [])
+
+        for path in (claimed, partial):
+            os.utime(path, (0, 0))
+
+        unit.recover()
+
+        self.assertEqual(unit.segments(), [segment])
+        self.assertFalse(partial.exists())
@@ -2,7 +2,9 @@ import unittest
 import pathlib
 import json
 
-from amberflo.transformer import extract_events_from_log
+from amberflo import metrics
+from amberflo.metrics import render_prometheus
+from amberflo.transformer import cache_stats, extract_events_from_log, slim_log
 
 _resources_path = pathlib.Path(__file__).parent.resolve() / "resources"
 
@@ -31,32 +33,33 @@ def _write_expected(name, data):
     _write_resource(name, "expected.json", data)
 
 
+_cases = [
+    # text completion
+    "bedrock-anthropic-claude-haiku.completion",
+    "openai-gpt-4o.completion",
+    "openai-text-embedding-ada-002.embedding",
+    "openai-team-key-a.completion",
+    "openai-team-key-b.completion",
+    # error cases
+    "disabled-model.completion",
+    "api-key-rate-limit.completion",
+    "internal-server-error.completion",
+    "team-rate-limit.completion",
+    "openai-rate-limit.completion",
+    # guardrail errors
+    "openai-guardrail-failure.completion",
+    "litellm-guardrail-failure.completion",
+    # other errors
+    "proxy-authz-error.completion",
+    # image gen
+    "bedrock-stability-v1.image_gen",
+    "openai-gpt-image-1.image_gen",
+]
+
+
 class TestTransformer(unittest.TestCase):
     def test_transformer_produces_events(self):
-        cases = [
-            # text completion
-            "bedrock-anthropic-claude-haiku.completion",
-            "openai-gpt-4o.completion",
-            "openai-text-embedding-ada-002.embedding",
-            "openai-team-key-a.completion",
-            "openai-team-key-b.completion",
-            # error cases
-            "disabled-model.completion",
-            "api-key-rate-limit.completion",
-            "internal-server-error.completion",
-            "team-rate-limit.completion",
-            "openai-rate-limit.completion",
-            # guardrail errors
-            "openai-guardrail-failure.completion",
-            "litellm-guardrail-failure.completion",
-            # other errors
-            "proxy-authz-error.completion",
-            # image gen
-            "bedrock-stability-v1.image_gen",
-            "openai-gpt-image-1.image_gen",
-        ]
-
-        for case in cases:
+        for case in _cases:
             with self.subTest(case=case):
                 log = _load_log(case)
 
@@ -67,3 +70,50 @@ class TestTransformer(unittest.TestCase):
 
                 expected = _load_expected(case)
                 self.assertEqual(events, expected)
+
+    def test_slim_log_produces_the_same_events(self):
+        for case in _cases:
+            with self.subTest(case=case):
+                log = _load_log(case)
+
+                events = extract_events_from_log(
+                    slim_log(log), send_metadata=True, hosted_env="agent1"
+                )
+
+                expected = _load_expected(case)
+                self.assertEqual(events, expected)
+
+    def test_resolutions_are_cached(self):
+        log = _load_log("bedrock-anthropic-claude-haiku.completion")
+
+        before = cache_stats()
+
+        for _ in range(3):
+            extract_events_from_log(log)
+
+        after = cache_stats()
+
+        for name in ("provider_model", "region"):
+            with self.subTest(cache=name):
+                hits = after[name]["hits"] - before[name]["hits"]
+                misses = after[name]["misses"] - before[name]["misses"]
+
+                self.assertGreaterEqual(hits, 2)
+                self.assertLessEqual(misses, 1)
+                self.assertGreater(after[name]["hit_rate"], 0)
+
+    def test_cache_stats_are_published(self):
+        extract_events_from_log(_load_log("bedrock-anthropic-claude-haiku.completion"))
+
+        text = render_prometheus(metrics.registry)
+
+        stats = cache_stats()["provider_model"]
+
+        self.assertIn(
+            f'aflo_transformer_cache_hits_total{{cache="provider_model"}} {stats["hits"]}',
+            text,
+        )
+        self.assertIn(
+            f'aflo_transformer_cache_misses_total{{cache="provider_model"}} {stats["misses"]}',
+            text,
+        )
@@ -0,0 +1,77 @@
+import asyncio
+import unittest
+from datetime import datetime
+
+from amberflo.blob_client import BlobWriter
+from amberflo.upload_scheduler import UploadScheduler
+from amberflo.utils import make_key
+
+
+class SlowWriter(BlobWriter):
+    def __init__(self):
+        self.items = []
+        self.running = 0
+        self.max_running = 0
+        self.release = asyncio.Event()
+
+    async def put_object(self, key: str, body: bytes) -> None:
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await self.release.wait()
+            if body == b"fail":
+                raise RuntimeError("boom!")
+            self.items.append((key, body))
+        finally:
+            self.running -= 1
+
+    def make_key(self, timestamp: datetime) -> str:
+        return make_key(timestamp, "path")
+
+
+class TestUploadScheduler(unittest.IsolatedAsyncioTestCase):
+    async def test_uploads_are_bounded(self):
+        writer = SlowWriter()
+        unit = UploadScheduler(writer, max_in_flight=2, max_pending=1)
+
+        for i in range(3):
+            await unit.submit(f"key-{i}", b"body")
+
+        await asyncio.sleep(0)
+
+        self.assertEqual(writer.running, 2)
+        self.assertEqual(unit.pending, 1)
+
+        # the queue is full, so submitting waits
+        submit = asyncio.create_task(unit.submit("key-3", b"body"))
+        await asyncio.sleep(0)
+        self.assertFalse(submit.done())
+
+        writer.release.set()
+        await submit
+
+        self.assertTrue(await unit.drain(1))
+        self.assertEqual(len(writer.items), 4)
+        self.assertEqual(writer.max_running, 2)
+
+    async def test_drain_times_out(self):
+        writer = SlowWriter()
+        unit = UploadScheduler(writer)
+
+        await unit.submit("key", b"body")
+
+        self.assertFalse(await unit.drain(0.01))
+
+        writer.release.set()
+        self.assertTrue(await unit.drain(1))
+
+    async def test_failed_uploads_do_not_stop_the_scheduler(self):
+        writer = SlowWriter()
+        writer.release.set()
+        unit = UploadScheduler(writer, max_in_flight=1)
+
+        await unit.submit("key-1", b"fail")
+        await unit.submit("key-2", b"body")
+
+        self.assertTrue(await unit.drain(1))
+        self.assertEqual(writer.items, [("key-2", b"body")])
@@ -2,7 +2,7 @@ import os
 import unittest
 from unittest.mock import patch
 
-from amberflo.utils import get_env, positive_int, boolean
+from amberflo.utils import get_env, positive_int, positive_float, boolean
 
 
 class TestUtilsGetEnv(unittest.TestCase):
@@ -36,6 +36,16 @@ class TestUtilsGetEnv(unittest.TestCase):
         with self.assertRaises(ValueError):
             get_env("KEY", validate=positive_int)
 
+    @patch.dict(os.environ, {"KEY": "0.5"})
+    def test_key_positive_float(self):
+        value = get_env("KEY", validate=positive_float)
+        self.assertEqual(value, 0.5)
+
+    @patch.dict(os.environ, {"KEY": "-1"})
+    def test_key_not_a_positive_float(self):
+        with self.assertRaises(ValueError):
+            get_env("KEY", validate=positive_float)
+
     @patch.dict(os.environ, {"KEY": "true"})
     def test_key_boolean(self):
         value = get_env("KEY", validate=boolean)
@@ -0,0 +1,39 @@
+import os
+import unittest
+from unittest.mock import patch
+
+from amberflo.blob_client import LazyBlobWriter
+from amberflo.writer_factory import build_client
+
+
+class TestBuildClient(unittest.TestCase):
+    @patch.dict(os.environ, {"AWS_REGION": "us-west-2"}, clear=True)
+    def test_missing_settings_fail_at_start_up(self):
+        with self.assertRaisesRegex(ValueError, "AFLO_BUCKET_NAME must be set"):
+            build_client("s3")
+
+        with self.assertRaisesRegex(ValueError, "AFLO_API_KEY must be set"):
+            build_client("api")
+
+    @patch.dict(os.environ, {"AFLO_CONTAINER_NAME": "logs"}, clear=True)
+    def test_azure_requires_credentials(self):
+        with self.assertRaisesRegex(ValueError, "AZURE_STORAGE_CONNECTION_STRING"):
+            build_client("azure")
+
+        with patch.dict(os.environ, {"AZURE_STORAGE_ACCOUNT_NAME": "account"}):
+            self.assertIsInstance(build_client("azure"), LazyBlobWriter)
+
+    @patch.dict(
+        os.environ,
+        {"AWS_REGION": "us-west-2", "AFLO_BUCKET_NAME": "bucket", "AFLO_PATH": "logs"},
+        clear=True,
+    )
+    def test_client_is_built_lazily(self):
+        client = build_client("s3")
+
+        self.assertIsInstance(client, LazyBlobWriter)
+        self.assertEqual(getattr(client, "path"), "logs")
+
+
+if __name__ == "__main__":
+    unittest.main()